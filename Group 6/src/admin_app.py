@@ -1,12 +1,40 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from gym_database import GymDatabase
+from flask import Flask, render_template, request, redirect, url_for, flash, session, Response, stream_with_context
+from gym_database import GymDatabase, DEFAULT_DURATION
+import metrics
+from rendering import enable_bytecode_cache
+import csv
+import io
+import json
 import os
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 app.secret_key = 'admin-secret-key-2024'
+enable_bytecode_cache(app)
 
-# Initialize database
-db = GymDatabase()
+# Initialize database (GYM_DB lets benchmarks and deployments point elsewhere)
+DB_PATH = os.environ.get('GYM_DB', 'gym_schedule.db')
+db = GymDatabase(DB_PATH)
+metrics.instrument_database(db)
+metrics.init_app(app, 'admin')
+
+# Rows per page on the schedule and bookings listings
+PAGE_SIZE = 50
+
+# Days of history shown by the dashboard utilization panels
+DASHBOARD_TREND_DAYS = 30
+
+# How far ahead recurring classes are expanded into sessions
+RECURRENCE_HORIZON_DAYS = 28
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# Column headers of the export endpoints
+EXPORT_COLUMNS = {
+    'schedule': ['id', 'name', 'date', 'time', 'capacity', 'booked_count', 'duration'],
+    'bookings': ['booking_id', 'schedule_id', 'session_name', 'session_date', 'session_time',
+                 'customer_name', 'customer_email', 'booking_time'],
+}
 
 # Authentication decorator
 def admin_required(f):
@@ -17,6 +45,53 @@ def admin_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def parse_cursor(value, parts):
+    """Turn an 'a|b|id' pagination cursor from the query string into a tuple."""
+    if not value:
+        return None
+    fields = value.split('|')
+    if len(fields) != parts:
+        return None
+    try:
+        fields[-1] = int(fields[-1])
+    except ValueError:
+        return None
+    return tuple(fields)
+
+def format_cursor(cursor):
+    return '|'.join(str(part) for part in cursor) if cursor else None
+
+def overlap_message(conflict):
+    _, name, date, time, end_time = conflict
+    return f'That slot overlaps {name} ({time}-{end_time}) on {date}!'
+
+def flash_skipped(skipped, limit=5):
+    """Flash the recurring sessions left out because they overlap others."""
+    if not skipped:
+        return
+    details = ', '.join(f'{date} {time} (clashes with {other} at {other_time})'
+                        for name, date, time, other, other_time in skipped[:limit])
+    more = f' and {len(skipped) - limit} more' if len(skipped) > limit else ''
+    flash(f'{len(skipped)} sessions skipped because they overlap: {details}{more}.', 'error')
+
+def stream_csv(columns, rows, chunk_size=64 * 1024):
+    """Yield CSV text in chunks of roughly chunk_size characters."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_ndjson(columns, rows):
+    """Yield one JSON object per line."""
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row))) + '\n'
+
 # Routes
 @app.route('/')
 def index():
@@ -50,13 +125,45 @@ def logout():
 @admin_required
 def dashboard():
     today_schedule = db.get_today_schedule()
-    return render_template('admin_dashboard.html', today_schedule=today_schedule)
+    
+    # Utilization panels read only the precomputed daily_stats rows
+    end = datetime.now().strftime('%Y-%m-%d')
+    start = (datetime.now() - timedelta(days=DASHBOARD_TREND_DAYS - 1)).strftime('%Y-%m-%d')
+    utilization = {
+        'day': db.get_utilization('day', start, end),
+        'class': db.get_utilization('class', start, end),
+        'slot': db.get_utilization('slot', start, end),
+    }
+    return render_template('admin_dashboard.html', today_schedule=today_schedule,
+                           utilization=utilization, trend_days=DASHBOARD_TREND_DAYS)
 
 @app.route('/schedule')
 @admin_required
 def schedule():
-    all_schedules = db.get_all_schedules()
-    return render_template('admin_schedule.html', schedules=all_schedules)
+    filters = {
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+        'name': request.args.get('name', '').strip(),
+        'availability': request.args.get('availability', ''),
+    }
+    after = parse_cursor(request.args.get('after'), 3)
+    schedules, next_after = db.get_schedules_page(
+        after=after,
+        limit=PAGE_SIZE,
+        date_from=filters['date_from'] or None,
+        date_to=filters['date_to'] or None,
+        name=filters['name'] or None,
+        availability=filters['availability'] or None,
+    )
+    
+    active_filters = {key: value for key, value in filters.items() if value}
+    next_url = None
+    if next_after:
+        next_url = url_for('schedule', after=format_cursor(next_after), **active_filters)
+    first_url = url_for('schedule', **active_filters) if after else None
+    
+    return render_template('admin_schedule.html', schedules=schedules, filters=filters,
+                           next_url=next_url, first_url=first_url)
 
 @app.route('/add_schedule', methods=['GET', 'POST'])
 @admin_required
@@ -66,8 +173,12 @@ def add_schedule():
         date = request.form.get('date')
         time = request.form.get('time')
         capacity = int(request.form.get('capacity', 20))
+        duration = int(request.form.get('duration', DEFAULT_DURATION))
         
-        if db.add_schedule(name, date, time, capacity):
+        conflicts = db.find_overlaps([(name, date, time, duration)])
+        if conflicts:
+            flash(overlap_message(conflicts[0]), 'error')
+        elif db.add_schedule(name, date, time, capacity, duration):
             flash('Schedule added successfully!', 'success')
             return redirect(url_for('schedule'))
         else:
@@ -89,8 +200,12 @@ def edit_schedule(schedule_id):
         date = request.form.get('date')
         time = request.form.get('time')
         capacity = int(request.form.get('capacity', 20))
+        duration = int(request.form.get('duration', DEFAULT_DURATION))
         
-        if db.update_schedule(schedule_id, name, date, time, capacity):
+        conflicts = db.find_overlaps([(name, date, time, duration)], exclude_id=schedule_id)
+        if conflicts:
+            flash(overlap_message(conflicts[0]), 'error')
+        elif db.update_schedule(schedule_id, name, date, time, capacity, duration):
             flash('Schedule updated successfully!', 'success')
             return redirect(url_for('schedule'))
         else:
@@ -112,20 +227,170 @@ def delete_schedule(schedule_id):
 @admin_required
 def view_bookings(schedule_id):
     schedule = db.get_schedule_by_id(schedule_id)
-    bookings = db.get_bookings_by_schedule(schedule_id)
     
     if not schedule:
         flash('Schedule not found!', 'error')
         return redirect(url_for('schedule'))
     
-    return render_template('admin_view_bookings.html', schedule=schedule, bookings=bookings)
+    after = parse_cursor(request.args.get('after'), 2)
+    bookings, next_after = db.get_bookings_page(schedule_id, after=after, limit=PAGE_SIZE)
+    next_url = None
+    if next_after:
+        next_url = url_for('view_bookings', schedule_id=schedule_id, after=format_cursor(next_after))
+    first_url = url_for('view_bookings', schedule_id=schedule_id) if after else None
+    waitlist = db.get_waitlist(schedule_id)
+    
+    return render_template('admin_view_bookings.html', schedule=schedule, bookings=bookings,
+                           waitlist=waitlist, next_url=next_url, first_url=first_url)
+
+@app.route('/cancel_booking/<int:schedule_id>', methods=['POST'])
+@admin_required
+def cancel_booking(schedule_id):
+    success, message = db.cancel_booking(schedule_id, request.form.get('email'))
+    
+    if success:
+        flash(f'{message}.', 'success')
+    else:
+        flash(f'Failed to cancel booking: {message}', 'error')
+    
+    return redirect(url_for('view_bookings', schedule_id=schedule_id))
+
+@app.route('/recurrence', methods=['GET', 'POST'])
+@admin_required
+def recurrence():
+    if request.method == 'POST':
+        name = request.form.get('name')
+        weekdays = [int(day) for day in request.form.getlist('weekdays')]
+        time = request.form.get('time')
+        capacity = int(request.form.get('capacity', 20))
+        duration = int(request.form.get('duration', DEFAULT_DURATION))
+        start_date = request.form.get('start_date')
+        weeks = request.form.get('weeks', type=int)
+        end_date = None
+        if weeks:
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+            end_date = (start + timedelta(weeks=weeks, days=-1)).strftime('%Y-%m-%d')
+        
+        if not weekdays:
+            flash('Pick at least one weekday!', 'error')
+        else:
+            rule_id = db.add_recurrence_rule(name, weekdays, time, capacity, start_date, end_date,
+                                             duration)
+            if rule_id:
+                created, skipped = db.expand_recurrence_rules(RECURRENCE_HORIZON_DAYS, rule_id)
+                flash(f'Recurring class added, {created} sessions created!', 'success')
+                flash_skipped(skipped)
+                return redirect(url_for('recurrence'))
+            flash('Failed to add recurring class!', 'error')
+    
+    rules = db.get_recurrence_rules()
+    return render_template('admin_recurrence.html', rules=rules, weekday_names=WEEKDAY_NAMES,
+                           horizon_days=RECURRENCE_HORIZON_DAYS,
+                           today=datetime.now().strftime('%Y-%m-%d'))
+
+@app.route('/recurrence/<int:rule_id>/delete', methods=['POST'])
+@admin_required
+def delete_recurrence(rule_id):
+    if db.delete_recurrence_rule(rule_id):
+        flash('Recurring class deleted along with its unbooked upcoming sessions!', 'success')
+    else:
+        flash('Failed to delete recurring class!', 'error')
+    return redirect(url_for('recurrence'))
+
+@app.route('/recurrence/expand', methods=['POST'])
+@admin_required
+def expand_recurrence():
+    created, skipped = db.expand_recurrence_rules(RECURRENCE_HORIZON_DAYS)
+    flash(f'{created} new sessions created from recurring classes.', 'success')
+    flash_skipped(skipped)
+    return redirect(url_for('recurrence'))
+
+@app.route('/reconcile', methods=['POST'])
+@admin_required
+def reconcile():
+    result = db.reconcile_booked_counts(full=request.form.get('mode') == 'full')
+    if result is None:
+        flash('Seat count check failed, see the server log.', 'error')
+        return redirect(url_for('dashboard'))
+    mode, checked, drifts = result
+    if not drifts:
+        flash(f'Seat counts OK: {checked} sessions checked ({mode}).', 'success')
+    else:
+        limit = 5
+        details = ', '.join(f'{d.name} {d.date} {d.time} ({d.recorded} -> {d.actual})' for d in drifts[:limit])
+        more = f' and {len(drifts) - limit} more' if len(drifts) > limit else ''
+        flash(f'Fixed {len(drifts)} of {checked} sessions checked ({mode}): {details}{more}.', 'error')
+        overbooked = sum(1 for d in drifts if d.overbooked)
+        if overbooked:
+            flash(f'{overbooked} sessions have more bookings than seats.', 'error')
+    return redirect(url_for('dashboard'))
+
+@app.route('/history')
+@admin_required
+def history():
+    filters = {
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+    }
+    after = parse_cursor(request.args.get('after'), 3)
+    sessions, next_after = db.get_archived_schedules_page(
+        after=after,
+        limit=PAGE_SIZE,
+        date_from=filters['date_from'] or None,
+        date_to=filters['date_to'] or None,
+    )
+    
+    active_filters = {key: value for key, value in filters.items() if value}
+    next_url = None
+    if next_after:
+        next_url = url_for('history', after=format_cursor(next_after), **active_filters)
+    first_url = url_for('history', **active_filters) if after else None
+    
+    return render_template('admin_history.html', sessions=sessions, filters=filters,
+                           next_url=next_url, first_url=first_url)
+
+@app.route('/history/<int:schedule_id>')
+@admin_required
+def history_bookings(schedule_id):
+    schedule = db.get_archived_schedule_by_id(schedule_id)
+    
+    if not schedule:
+        flash('Archived session not found!', 'error')
+        return redirect(url_for('history'))
+    
+    bookings = db.get_archived_bookings(schedule_id)
+    return render_template('admin_history_bookings.html', schedule=schedule, bookings=bookings)
+
+@app.route('/export/<any(schedule, bookings):table>.<any(csv, ndjson):fmt>')
+@admin_required
+def export(table, fmt):
+    date_from = request.args.get('date_from') or None
+    date_to = request.args.get('date_to') or None
+    if table == 'bookings':
+        rows = db.iter_bookings(date_from, date_to, request.args.get('schedule_id', type=int))
+    else:
+        rows = db.iter_schedules(date_from, date_to)
+    
+    columns = EXPORT_COLUMNS[table]
+    if fmt == 'csv':
+        body, mimetype = stream_csv(columns, rows), 'text/csv'
+    else:
+        body, mimetype = stream_ndjson(columns, rows), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={table}.{fmt}'},
+    )
 
 if __name__ == '__main__':
     # Initialize database with sample data
-    if not os.path.exists("gym_schedule.db"):
+    if not os.path.exists(DB_PATH):
         db.initialize_sample_data()
         print("Database initialized with sample data.")
     
+    # Roll the recurring classes forward to the current horizon
+    db.expand_recurrence_rules(RECURRENCE_HORIZON_DAYS)
+    
     print("🏋️ Gymnasium Scheduler - Admin Interface")
     print("=" * 50)
     print("Starting Admin Flask server...")
@@ -133,4 +398,5 @@ if __name__ == '__main__':
     print("Credentials: admin / admin123")
     print("=" * 50)
     
+    # Development server; production runs under serve.py (python serve.py admin)
     app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,4 @@
+"""Benchmarks and stress tests for the gym scheduler.
+
+Run them from the ``src`` directory, e.g. ``python -m benchmarks.stress_booking``.
+"""
@@ -0,0 +1,69 @@
+"""Compare per-request commits with the group-commit BookingWriter.
+
+Every thread books its share of seats as fast as it can, first through
+GymDatabase.book_session (one transaction per booking), then through a
+BookingWriter (one transaction per micro-batch).
+
+Usage: python -m benchmarks.bench_group_commit [--threads 64] [--bookings 4000]
+                                                [--max-batch 64] [--max-wait-ms 5]
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import temp_db_path
+from booking_queue import BookingWriter
+from gym_database import GymDatabase
+
+
+def run(book, threads, bookings):
+    per_thread = bookings // threads
+    results = []
+
+    def worker(slot):
+        for n in range(per_thread):
+            results.append(book(1, f"Customer {slot}-{n}", f"c{slot}-{n}@example.com")[0])
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(results), time.perf_counter() - start
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--bookings", type=int, default=4000)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"threads={args.threads} bookings={args.bookings} "
+          f"max_batch={args.max_batch} max_wait={args.max_wait_ms}ms")
+    print("mode          | booked | seconds | bookings/s")
+    print("-" * 48)
+
+    with temp_db_path() as path:
+        db = GymDatabase(path, pool_size=args.threads + 1)
+        db.add_schedule("Burst Session", "2030-01-01", "09:00", args.bookings)
+        booked, elapsed = run(db.book_session, args.threads, args.bookings)
+        print(f"per-request   | {booked:6d} | {elapsed:7.3f} | {booked / elapsed:10.0f}")
+        db.close()
+
+    with temp_db_path() as path:
+        db = GymDatabase(path, pool_size=args.threads + 1)
+        db.add_schedule("Burst Session", "2030-01-01", "09:00", args.bookings)
+        writer = BookingWriter(db, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+        booked, elapsed = run(writer.book, args.threads, args.bookings)
+        writer.stop()
+        print(f"group-commit  | {booked:6d} | {elapsed:7.3f} | {booked / elapsed:10.0f}")
+        print(f"  {writer.batches} transactions, {writer.bookings / max(writer.batches, 1):.1f} bookings each")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure how get_upcoming_schedule throughput scales with reader threads.
+
+A background writer keeps calling book_session while the readers run, to
+show that WAL readers are not blocked by the write lock.
+
+Usage: python -m benchmarks.bench_read_scaling [--sessions 300]
+                                                [--duration 2] [--no-writer]
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import temp_db_path
+from gym_database import GymDatabase
+
+THREAD_COUNTS = (1, 2, 4, 8, 16)
+
+
+def populate(db, sessions):
+    today = datetime.now()
+    rows = []
+    for i in range(sessions):
+        date = (today + timedelta(days=i % 14)).strftime("%Y-%m-%d")
+        time_slot = f"{6 + (i // 14) % 16:02d}:{(i * 7) % 60:02d}"
+        # Short sessions so the dense slots do not trip the overlap check
+        rows.append((f"Class {i}", date, time_slot, 1000000, 5))
+    db.add_schedules(rows)
+
+
+def measure(db, threads, duration, with_writer):
+    reads = [0] * threads
+    bookings = [0]
+    stop = threading.Event()
+    schedule_ids = [row.id for row in db.get_upcoming_schedule(14)]
+
+    def reader(slot):
+        while not stop.is_set():
+            db.get_upcoming_schedule(14)
+            reads[slot] += 1
+
+    def writer():
+        n = 0
+        while not stop.is_set():
+            # A fresh email per attempt; repeats would be rejected as "Already booked"
+            ok, _ = db.book_session(schedule_ids[n % len(schedule_ids)], "Writer",
+                                    f"writer{threads}-{n}@example.com")
+            bookings[0] += ok
+            n += 1
+
+    pool = [threading.Thread(target=reader, args=(i,)) for i in range(threads)]
+    if with_writer:
+        pool.append(threading.Thread(target=writer))
+    for t in pool:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in pool:
+        t.join()
+    return sum(reads) / duration, bookings[0] / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--no-writer", action="store_true")
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        # No query cache: every read has to go to SQLite, which is what this measures
+        db = GymDatabase(db_path, pool_size=max(THREAD_COUNTS) + 1, cache_entries=0)
+        populate(db, args.sessions)
+        print(f"sessions={args.sessions} rows/read={len(db.get_upcoming_schedule(14))} "
+              f"writer={'off' if args.no_writer else 'on'}")
+        print("threads | reads/s | bookings/s")
+        print("-" * 34)
+        for threads in THREAD_COUNTS:
+            read_rate, write_rate = measure(db, threads, args.duration, not args.no_writer)
+            print(f"{threads:7d} | {read_rate:7.0f} | {write_rate:10.0f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
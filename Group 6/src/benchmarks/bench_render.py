@@ -0,0 +1,112 @@
+"""Measure /schedule render time against the number of sessions shown.
+
+For each size the 14-day window is filled up to that many sessions and the
+page is requested (without validators, so it is always rendered) in three
+states: with the day fragment cache disabled, with every day cached, and
+right after a booking changed one day. It also times compiling every
+template from source against loading them from the bytecode cache, which is
+what a freshly started worker pays.
+
+Usage: python -m benchmarks.bench_render [--sizes 100,500,2000,5000]
+                                         [--repeat 20]
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from jinja2 import FileSystemBytecodeCache
+
+from benchmarks.common import load_app, temp_db_path
+
+SCHEDULE_DAYS = 14
+
+
+def populate(db, first, last):
+    """Add sessions first..last-1, spread over the window in 3-minute slots."""
+    today = datetime.now()
+    rows = []
+    for i in range(first, last):
+        date = (today + timedelta(days=1 + i % SCHEDULE_DAYS)).strftime("%Y-%m-%d")
+        minute = (i // SCHEDULE_DAYS) * 3
+        rows.append((f"Class {i % 10}", date, f"{minute // 60:02d}:{minute % 60:02d}", 20, 3))
+    _, conflicts, invalid = db.add_schedules(rows)
+    assert not conflicts and not invalid, conflicts[:3]
+
+
+def time_requests(client, repeat, before_each=None):
+    total = 0.0
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        response = client.get("/schedule")
+        total += time.perf_counter() - start
+        assert response.status_code == 200
+    return total / repeat * 1000
+
+
+def time_compile(app, names, bytecode_cache):
+    env = app.jinja_env
+    saved = env.bytecode_cache
+    env.bytecode_cache = bytecode_cache
+    try:
+        env.cache.clear()
+        start = time.perf_counter()
+        for name in names:
+            env.get_template(name)
+        return (time.perf_counter() - start) * 1000
+    finally:
+        env.bytecode_cache = saved
+        env.cache.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,500,2000,5000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    with temp_db_path() as db_path:
+        customer_app = load_app("customer_app", db_path)
+        app = customer_app.app
+        db = customer_app.db
+        # Keep the query cache out of the way; this measures rendering
+        db.cache = None
+        cache = customer_app.day_fragment_cache
+        client = app.test_client()
+        bookings = iter(range(10 ** 9))
+
+        print(f"{'sessions':>8} {'uncached ms':>12} {'cached ms':>10} {'one day ms':>11}")
+        shown = 0
+        for size in sizes:
+            populate(db, shown, size)
+            shown = size
+            schedule_ids = [row.id for row in db.get_upcoming_schedule(SCHEDULE_DAYS)]
+
+            def book_one():
+                n = next(bookings)
+                db.book_session(schedule_ids[n % len(schedule_ids)], f"Member {n}", f"m{n}@example.com")
+
+            cache.clear()
+            cache.maxsize = 0
+            uncached = time_requests(client, args.repeat)
+            cache.maxsize = 4 * SCHEDULE_DAYS
+            client.get("/schedule")
+            cached = time_requests(client, args.repeat)
+            one_day = time_requests(client, args.repeat, before_each=book_one)
+            print(f"{size:>8} {uncached:>12.2f} {cached:>10.2f} {one_day:>11.2f}")
+        db.close()
+
+    names = app.jinja_env.list_templates()
+    with tempfile.TemporaryDirectory(prefix="gym-jinja-") as directory:
+        bytecode_cache = FileSystemBytecodeCache(directory)
+        time_compile(app, names, bytecode_cache)  # fill the cache
+        compiled = time_compile(app, names, None)
+        loaded = time_compile(app, names, bytecode_cache)
+    print(f"templates={len(names)} compile={compiled:.1f}ms bytecode_cache={loaded:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compare the memory and build time of row representations for big listings.
+
+Loads the same schedule listing through different row factories (plain
+tuples, sqlite3.Row, dicts, a hand-written __slots__ class and the
+rows.Schedule namedtuple GymDatabase returns) and reports how much memory
+the resulting list holds, measured with tracemalloc. Load times include
+tracemalloc overhead, so compare them with each other only.
+
+Usage: python -m benchmarks.bench_row_memory [--rows 100000]
+"""
+import argparse
+import gc
+import sqlite3
+import time
+import tracemalloc
+
+from benchmarks.common import temp_db_path
+from gym_database import GymDatabase
+from rows import Schedule, query
+
+SQL = "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule ORDER BY id"
+
+
+class SlotsSchedule:
+    __slots__ = Schedule._fields
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+
+def dict_factory(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def populate(db_path, rows):
+    db = GymDatabase(db_path)
+    db.close()
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO schedule (name, date, time, capacity, booked_count, duration) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((f"Class {i % 50}", f"20{30 + i // 40000}-{1 + i // 3000 % 12:02d}-{1 + i // 100 % 28:02d}",
+              f"{6 + i % 16:02d}:00", 20, i % 21, 60) for i in range(rows)),
+        )
+    conn.close()
+
+
+def measure(conn, load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = load(conn)
+    elapsed = time.perf_counter() - start
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return size, elapsed
+
+
+def load_tuples(conn):
+    return conn.execute(SQL).fetchall()
+
+
+def load_sqlite_row(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    return cursor.execute(SQL).fetchall()
+
+
+def load_dicts(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = dict_factory
+    return cursor.execute(SQL).fetchall()
+
+
+def load_slots(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = lambda cursor, row: SlotsSchedule(*row)
+    return cursor.execute(SQL).fetchall()
+
+
+def load_schedule(conn):
+    return query(conn, Schedule, SQL).fetchall()
+
+
+VARIANTS = [
+    ("tuple", load_tuples),
+    ("sqlite3.Row", load_sqlite_row),
+    ("dict", load_dicts),
+    ("__slots__ class", load_slots),
+    ("rows.Schedule", load_schedule),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        populate(db_path, args.rows)
+        conn = sqlite3.connect(db_path)
+        print(f"rows={args.rows}")
+        print(f"{'representation':18}{'MiB':>10}{'bytes/row':>12}{'load ms':>10}")
+        for label, load in VARIANTS:
+            size, elapsed = measure(conn, load)
+            print(f"{label:18}{size / 2 ** 20:>10.1f}{size / args.rows:>12.0f}{elapsed * 1000:>10.0f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
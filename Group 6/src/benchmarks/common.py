@@ -0,0 +1,48 @@
+"""Helpers shared by the benchmark scripts."""
+import importlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def temp_db_path(name="bench.db"):
+    """Yield the path of a database file inside a throwaway directory."""
+    directory = tempfile.mkdtemp(prefix="gym-bench-")
+    try:
+        yield os.path.join(directory, name)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_app(module_name, db_path):
+    """Import admin_app or customer_app bound to the given database file.
+
+    The apps create their GymDatabase at import time, so GYM_DB has to be set
+    before the first import.
+    """
+    os.environ["GYM_DB"] = db_path
+    return importlib.import_module(module_name)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Latency percentiles (ms) and throughput for one route."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
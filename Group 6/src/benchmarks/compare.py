@@ -0,0 +1,34 @@
+"""Compare two loadtest result files route by route.
+
+Usage: python -m benchmarks.compare baseline.json candidate.json
+"""
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.strip())
+    with open(sys.argv[1]) as f:
+        baseline = json.load(f)["routes"]
+    with open(sys.argv[2]) as f:
+        candidate = json.load(f)["routes"]
+
+    print(f"{'route':36}" + "".join(f"{metric:>22}" for metric in METRICS))
+    for route in sorted(set(baseline) | set(candidate)):
+        cells = []
+        for metric in METRICS:
+            old = baseline.get(route, {}).get(metric)
+            new = candidate.get(route, {}).get(metric)
+            if old is None or new is None:
+                cells.append(f"{'-':>22}")
+            else:
+                change = (new - old) / old * 100 if old else 0.0
+                cells.append(f"{old:>8.1f} -> {new:>7.1f} {change:+5.0f}%")
+        print(f"{route:36}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    main()
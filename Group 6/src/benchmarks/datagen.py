@@ -0,0 +1,85 @@
+"""Generate a reproducible gym database with N schedules and M bookings.
+
+Sessions are spread over the past year and the coming month; bookings are
+assigned to random free seats, so no session is overbooked and no customer
+books the same session twice. Everything is bulk-inserted with executemany
+in a single transaction.
+
+Usage: python -m benchmarks.datagen out.db [--schedules 10000]
+                                           [--bookings 100000] [--seed 0]
+"""
+import argparse
+import bisect
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from gym_database import GymDatabase
+
+CLASS_NAMES = [
+    "Morning Yoga", "HIIT Training", "Strength Training", "Evening Pilates",
+    "Boxing Basics", "Dance Fitness", "Spin Class", "Basketball Open Court",
+    "Volleyball League", "Badminton Doubles",
+]
+TIME_SLOTS = ["06:00", "07:00", "08:30", "10:00", "12:30", "15:00", "17:00", "18:00", "19:30", "21:00"]
+
+
+def generate(db_path, schedules, bookings, seed=0, days_back=365, days_ahead=30):
+    """Fill db_path with generated data and return the elapsed seconds."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    span = days_back + days_ahead
+
+    schedule_rows = []
+    for _ in range(schedules):
+        date = (today + timedelta(days=rng.randrange(span) - days_back)).strftime("%Y-%m-%d")
+        schedule_rows.append((rng.choice(CLASS_NAMES), date, rng.choice(TIME_SLOTS), rng.randint(10, 40)))
+
+    capacities = [row[3] for row in schedule_rows]
+    total_seats = sum(capacities)
+    if bookings > total_seats:
+        raise ValueError(f"{bookings} bookings do not fit into {total_seats} seats")
+    # Each seat is numbered globally; cumulative capacities map it to a session
+    seat_ends = list(accumulate(capacities))
+    customers = max(max(capacities, default=1), bookings // 3, 1)
+
+    start = time.perf_counter()
+    db = GymDatabase(db_path, cache_entries=0)
+    with db.pool.connection() as conn:
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM schedule").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO schedule (name, date, time, capacity) VALUES (?, ?, ?, ?)",
+            schedule_rows
+        )
+
+        def booking_rows():
+            for seat in sorted(rng.sample(range(total_seats), bookings)):
+                index = bisect.bisect_right(seat_ends, seat)
+                seat_in_session = seat - (seat_ends[index - 1] if index else 0)
+                # Consecutive customer numbers within a session never repeat
+                customer = (index * 7919 + seat_in_session) % customers
+                yield (first_id + index, f"Customer {customer}", f"customer{customer}@example.com")
+
+        conn.executemany(
+            "INSERT INTO bookings (schedule_id, customer_name, customer_email) VALUES (?, ?, ?)",
+            booking_rows()
+        )
+        conn.commit()
+    db.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path")
+    parser.add_argument("--schedules", type=int, default=10000)
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    elapsed = generate(args.db_path, args.schedules, args.bookings, args.seed)
+    print(f"{args.db_path}: {args.schedules} schedules, {args.bookings} bookings in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
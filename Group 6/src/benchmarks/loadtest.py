@@ -0,0 +1,190 @@
+"""Load-test the admin and customer apps on a generated database.
+
+Each route is driven by concurrent clients, either through Flask's test
+client (the default) or over HTTP against local threaded servers
+(--server). p50/p95/p99 latency and throughput are printed per route and
+saved as JSON; compare two result files with benchmarks.compare.
+
+Usage: python -m benchmarks.loadtest [--schedules 10000] [--bookings 100000]
+                                     [--clients 8] [--requests 200]
+                                     [--seed 0] [--server] [--output results.json]
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import platform
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from benchmarks.common import load_app, summarize, temp_db_path
+from benchmarks.datagen import generate
+
+
+def build_routes(rng, schedule_ids, upcoming_ids):
+    """(app, name, method, path factory, json body factory) for every route."""
+    counter = iter(range(10 ** 9))
+    return [
+        ("customer", "GET /schedule", "GET", lambda: "/schedule", None),
+        ("customer", "GET /book/<id>", "GET", lambda: f"/book/{rng.choice(upcoming_ids)}", None),
+        ("customer", "POST /api/book", "POST", lambda: "/api/book", lambda: {
+            "schedule_id": rng.choice(upcoming_ids),
+            "name": "Load Test", "email": f"load{next(counter)}@example.com",
+        }),
+        ("admin", "GET /dashboard", "GET", lambda: "/dashboard", None),
+        ("admin", "GET /schedule", "GET", lambda: "/schedule", None),
+        ("admin", "GET /schedule?name=", "GET", lambda: "/schedule?name=Yoga&availability=open", None),
+        ("admin", "GET /view_bookings/<id>", "GET",
+         lambda: f"/view_bookings/{rng.choice(schedule_ids)}", None),
+    ]
+
+
+class TestClientDriver:
+    """Send requests through app.test_client() (no sockets)."""
+
+    def __init__(self, apps):
+        self.apps = apps
+
+    def client(self, app_name):
+        client = self.apps[app_name].app.test_client()
+        if app_name == "admin":
+            with client.session_transaction() as session:
+                session["admin_logged_in"] = True
+                session["admin_username"] = "admin"
+
+        def send(method, path, body):
+            response = client.open(path, method=method, json=body)
+            response.close()
+            return response.status_code
+        return send
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """Serve both apps on local threaded Werkzeug servers and use urllib."""
+
+    def __init__(self, apps):
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        self.servers = {}
+        for name, module in apps.items():
+            server = make_server("127.0.0.1", 0, module.app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers[name] = server
+
+    def client(self, app_name):
+        base = f"http://127.0.0.1:{self.servers[app_name].server_port}"
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        if app_name == "admin":
+            form = urllib.parse.urlencode({"username": "admin", "password": "admin123"}).encode()
+            opener.open(base + "/login", data=form).read()
+
+        def send(method, path, body):
+            data = json.dumps(body).encode() if body is not None else None
+            request = urllib.request.Request(base + path, data=data, method=method,
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with opener.open(request) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return send
+
+    def close(self):
+        for server in self.servers.values():
+            server.shutdown()
+
+
+def drive(driver, app_name, method, make_path, make_body, clients, requests):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_client = max(1, requests // clients)
+
+    def worker():
+        send = driver.client(app_name)
+        local = []
+        failed = 0
+        for _ in range(per_client):
+            with lock:
+                path, body = make_path(), make_body() if make_body else None
+            start = time.perf_counter()
+            status = send(method, path, body)
+            local.append(time.perf_counter() - start)
+            # 400 is a normal answer from /api/book once a session fills up
+            failed += status >= 500
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return summarize(latencies, time.perf_counter() - start, errors[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schedules", type=int, default=10000)
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server", action="store_true", help="go over HTTP to local servers")
+    parser.add_argument("--output", default="loadtest-results.json")
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        generate(db_path, args.schedules, args.bookings, args.seed)
+        conn = sqlite3.connect(db_path)
+        schedule_ids = [row[0] for row in conn.execute("SELECT id FROM schedule")]
+        today = datetime.now().strftime("%Y-%m-%d")
+        upcoming_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM schedule WHERE date >= ?", (today,))] or schedule_ids
+        conn.close()
+
+        apps = {"customer": load_app("customer_app", db_path), "admin": load_app("admin_app", db_path)}
+        driver = ServerDriver(apps) if args.server else TestClientDriver(apps)
+        rng = random.Random(args.seed)
+
+        results = {}
+        print(f"{'route':28} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for app_name, name, method, make_path, make_body in build_routes(rng, schedule_ids, upcoming_ids):
+            stats = drive(driver, app_name, method, make_path, make_body, args.clients, args.requests)
+            results[f"{app_name} {name}"] = stats
+            print(f"{app_name[0]} {name:26} {stats['throughput_rps']:8.1f} {stats['p50_ms']:8.2f} "
+                  f"{stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f} {stats['errors']:6d}")
+        driver.close()
+        for module in apps.values():
+            module.db.close()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "transport": "http" if args.server else "test_client",
+            **{key: value for key, value in vars(args).items() if key not in ("output", "server")},
+        },
+        "routes": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Hammer /api/book from many threads and check nobody gets overbooked.
+
+Usage: python -m benchmarks.stress_booking [--threads 32] [--sessions 5]
+                                            [--capacity 40] [--attempts 2000]
+                                            [--group-commit]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from benchmarks.common import load_app, temp_db_path
+
+
+def run(threads, sessions, capacity, attempts):
+    with temp_db_path() as db_path:
+        customer_app = load_app("customer_app", db_path)
+        db = customer_app.db
+        for i in range(sessions):
+            db.add_schedule(f"Stress Session {i}", "2030-01-01", f"{8 + i:02d}:00", capacity)
+        schedule_ids = [row.id for row in db.get_all_schedules()]
+
+        successes = []
+        full = []
+        errors = []
+        counter = iter(range(attempts))
+        counter_lock = threading.Lock()
+
+        def worker():
+            client = customer_app.app.test_client()
+            while True:
+                with counter_lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                response = client.post("/api/book", json={
+                    "schedule_id": schedule_ids[n % len(schedule_ids)],
+                    "name": f"Customer {n}",
+                    "email": f"customer{n}@example.com",
+                })
+                message = (response.get_json() or {}).get("message", response.status)
+                if response.status_code == 200:
+                    successes.append(n)
+                elif message == "Session is full":
+                    full.append(n)
+                else:
+                    errors.append(message)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        # Verify with a fresh connection so nothing is served from app state
+        check = sqlite3.connect(db_path)
+        rows = check.execute(
+            """
+            SELECT s.id, s.capacity, s.booked_count,
+                   (SELECT COUNT(*) FROM bookings b WHERE b.schedule_id = s.id)
+            FROM schedule s
+            """
+        ).fetchall()
+        check.close()
+        db.close()
+
+    overbooked = [r for r in rows if r[2] > r[1] or r[3] > r[1]]
+    drifted = [r for r in rows if r[2] != r[3]]
+    expected = min(attempts, sessions * capacity)
+
+    print(f"threads={threads} sessions={sessions} capacity={capacity} attempts={attempts}")
+    print(f"booked={len(successes)} (expected {expected}) full={len(full)} errors={len(errors)}")
+    print(f"elapsed={elapsed:.3f}s  throughput={attempts / elapsed:.1f} requests/s  "
+          f"{len(successes) / elapsed:.1f} bookings/s")
+    if errors:
+        print(f"first error: {errors[0]}")
+
+    ok = not overbooked and not drifted and len(successes) == expected
+    print("PASS: no overbooking" if ok else f"FAIL: overbooked={overbooked} drifted={drifted}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--capacity", type=int, default=40)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--group-commit", action="store_true",
+                        help="route bookings through the group-commit BookingWriter")
+    args = parser.parse_args()
+    if args.group_commit:
+        os.environ["GYM_GROUP_COMMIT"] = "1"
+    ok = run(args.threads, args.sessions, args.capacity, args.attempts)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Cancel bookings and join waitlists from many threads at once.
+
+Every session starts full. Workers then mix cancellations of existing
+bookings with waitlist joins; each cancellation must hand its seat to the
+head of the waitlist in the same transaction. Afterwards the database is
+checked for overbooking, seat count drift, free seats left while people are
+still waiting, and customers who ended up both booked and waiting.
+
+Usage: python -m benchmarks.stress_waitlist [--threads 32] [--sessions 5]
+                                             [--capacity 40] [--operations 4000]
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+from benchmarks.common import load_app, temp_db_path
+
+
+def run(threads, sessions, capacity, operations, seed=1):
+    with temp_db_path() as db_path:
+        customer_app = load_app("customer_app", db_path)
+        db = customer_app.db
+        for i in range(sessions):
+            db.add_schedule(f"Waitlist Session {i}", "2030-01-01", f"{8 + i:02d}:00", capacity)
+        schedule_ids = [row.id for row in db.get_all_schedules()]
+        db.book_many([
+            {"schedule_id": schedule_id, "name": f"Member {n}", "email": f"member{n}@example.com"}
+            for schedule_id in schedule_ids for n in range(capacity)
+        ])
+
+        # Customers who may hold a seat, per session; anyone in here can cancel
+        holders = {schedule_id: [f"member{n}@example.com" for n in range(capacity)]
+                   for schedule_id in schedule_ids}
+        counts = {"cancelled": 0, "not_found": 0, "joined": 0, "errors": []}
+        state_lock = threading.Lock()
+        counter = iter(range(operations))
+
+        def worker(worker_id):
+            client = customer_app.app.test_client()
+            rng = random.Random(seed * 1000 + worker_id)
+            while True:
+                with state_lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                schedule_id = rng.choice(schedule_ids)
+                if rng.random() < 0.5:
+                    with state_lock:
+                        email = rng.choice(holders[schedule_id])
+                    response = client.post("/api/bookings/cancel",
+                                           json={"schedule_id": schedule_id, "email": email})
+                    message = (response.get_json() or {}).get("message", response.status)
+                    with state_lock:
+                        if response.status_code == 200:
+                            counts["cancelled"] += 1
+                        elif message == "Booking not found":
+                            counts["not_found"] += 1
+                        else:
+                            counts["errors"].append(message)
+                else:
+                    email = f"waiter{n}@example.com"
+                    response = client.post("/api/waitlist", json={
+                        "schedule_id": schedule_id, "name": f"Waiter {n}", "email": email,
+                    })
+                    message = (response.get_json() or {}).get("message", response.status)
+                    with state_lock:
+                        if response.status_code == 200:
+                            counts["joined"] += 1
+                            holders[schedule_id].append(email)
+                        elif not message.startswith("Session has free seats"):
+                            counts["errors"].append(message)
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        # Verify with a fresh connection so nothing is served from app state
+        check = sqlite3.connect(db_path)
+        rows = check.execute(
+            """
+            SELECT s.id, s.capacity, s.booked_count,
+                   (SELECT COUNT(*) FROM bookings b WHERE b.schedule_id = s.id),
+                   (SELECT COUNT(*) FROM waitlist w WHERE w.schedule_id = s.id)
+            FROM schedule s
+            """
+        ).fetchall()
+        both = check.execute(
+            """
+            SELECT COUNT(*) FROM waitlist w
+            JOIN bookings b ON b.schedule_id = w.schedule_id AND b.customer_email = w.customer_email
+            """
+        ).fetchone()[0]
+        promoted = check.execute(
+            "SELECT COUNT(*) FROM bookings WHERE customer_email LIKE 'waiter%'"
+        ).fetchone()[0]
+        waiting = sum(r[4] for r in rows)
+        check.close()
+        db.close()
+
+    overbooked = [r for r in rows if r[2] > r[1] or r[3] > r[1]]
+    drifted = [r for r in rows if r[2] != r[3]]
+    stranded = [r for r in rows if r[4] and r[2] < r[1]]
+    # Every cancellation frees a seat that is either refilled from the waitlist
+    # or left empty, and every joiner is either promoted or still waiting, so
+    # both sides must agree on how many promotions happened
+    empty_seats = sum(r[1] - r[2] for r in rows)
+    balanced = counts["cancelled"] - empty_seats == counts["joined"] - waiting
+
+    print(f"threads={threads} sessions={sessions} capacity={capacity} operations={operations}")
+    print(f"cancelled={counts['cancelled']} not_found={counts['not_found']} joined={counts['joined']} "
+          f"promoted_and_kept={promoted} still_waiting={waiting} empty_seats={empty_seats} "
+          f"errors={len(counts['errors'])}")
+    print(f"elapsed={elapsed:.3f}s  throughput={operations / elapsed:.1f} operations/s")
+    if counts["errors"]:
+        print(f"first error: {counts['errors'][0]}")
+
+    ok = not (overbooked or drifted or stranded or both or counts["errors"]) and balanced
+    print("PASS: waitlist consistent" if ok else
+          f"FAIL: overbooked={overbooked} drifted={drifted} stranded={stranded} "
+          f"booked_and_waiting={both} balanced={balanced}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--capacity", type=int, default=40)
+    parser.add_argument("--operations", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    ok = run(args.threads, args.sessions, args.capacity, args.operations, args.seed)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Group-commit pipeline for bookings under burst load.
+
+Request threads hand their booking to a BookingWriter and wait on a future.
+A single writer thread drains the queue in micro-batches and applies each
+batch with GymDatabase.book_many in best-effort mode, so a burst of N
+bookings costs a handful of commits (and fsyncs) instead of N. Every future
+is resolved with that booking's own (success, message) result.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class BookingWriter:
+    def __init__(self, db, max_batch=64, max_wait=0.005):
+        """max_batch caps the bookings per transaction; max_wait is how long
+        (in seconds) the writer waits for more bookings after the first one."""
+        self.db = db
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.bookings = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the writer thread if it is not running yet.
+
+        Called lazily from submit, so the thread is created in the process
+        that serves requests rather than in a parent that later forks.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="booking-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """Finish the queued bookings and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, schedule_id, customer_name, customer_email):
+        """Queue a booking and return a Future for its (success, message)."""
+        future = Future()
+        try:
+            schedule_id = int(schedule_id)
+        except (TypeError, ValueError):
+            future.set_result((False, "Schedule not found"))
+            return future
+        self.start()
+        self._queue.put((future, {"schedule_id": schedule_id, "name": customer_name,
+                                  "email": customer_email}))
+        return future
+
+    def book(self, schedule_id, customer_name, customer_email, timeout=30):
+        """Book a session through the queue, with book_session's return value."""
+        return self.submit(schedule_id, customer_name, customer_email).result(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._apply(batch)
+            if stopping:
+                return
+
+    def _apply(self, batch):
+        futures = [future for future, _ in batch]
+        try:
+            _, results = self.db.book_many([booking for _, booking in batch], atomic=False)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.bookings += len(batch)
+        for future, result in zip(futures, results):
+            future.set_result(result)
@@ -1,31 +1,168 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 from gym_database import GymDatabase
+import metrics
+from booking_queue import BookingWriter
+from live_updates import SeatFeed
+from http_cache import make_etag, parse_timestamp, not_modified, cached_response
+from query_cache import QueryCache
+from rendering import enable_bytecode_cache, render_fragment
+from datetime import datetime, timedelta, timezone
+import json
 import os
 
 app = Flask(__name__)
 app.secret_key = 'customer-secret-key-2024'
+enable_bytecode_cache(app)
 
-# Initialize database
-db = GymDatabase()
+# Largest batch accepted by /api/book/batch
+MAX_BATCH_BOOKINGS = 500
+
+# Days shown on /schedule, and the widest range /api/schedule will serve
+SCHEDULE_DAYS = 14
+MAX_API_RANGE_DAYS = 92
+
+# How long (seconds) a data version read may be reused for ETag checks
+VERSION_MAX_AGE = 0.5
+
+API_SCHEDULE_COLUMNS = ['id', 'name', 'date', 'time', 'capacity', 'booked_count', 'duration']
+API_BOOKING_COLUMNS = ['booking_id', 'schedule_id', 'name', 'date', 'time', 'duration', 'booking_time']
+
+# Start-time bands for the ?band= filter of /schedule and /api/schedule
+TIME_BANDS = {
+    'morning': ('00:00', '12:00'),
+    'afternoon': ('12:00', '17:00'),
+    'evening': ('17:00', '24:00'),
+}
+
+# Past bookings listed on /my-bookings and /api/bookings
+PAST_BOOKINGS_LIMIT = 50
+
+# Rendered /schedule day cards, keyed by date and tagged with that day's rows,
+# so a write only re-renders the days whose sessions it changed
+day_fragment_cache = QueryCache(maxsize=4 * SCHEDULE_DAYS, ttl=3600.0)
+
+# Initialize database (GYM_DB lets benchmarks and deployments point elsewhere)
+DB_PATH = os.environ.get('GYM_DB', 'gym_schedule.db')
+db = GymDatabase(DB_PATH)
+metrics.instrument_database(db)
+metrics.init_app(app, 'customer')
+
+# Optional group-commit pipeline for bursty registration (GYM_GROUP_COMMIT=1)
+booking_writer = None
+if os.environ.get('GYM_GROUP_COMMIT') == '1':
+    booking_writer = BookingWriter(
+        db,
+        max_batch=int(os.environ.get('GYM_GROUP_COMMIT_MAX_BATCH', 64)),
+        max_wait=float(os.environ.get('GYM_GROUP_COMMIT_MAX_WAIT_MS', 5)) / 1000,
+    )
+
+# One change feed per process, shared by every live schedule page
+seat_feed = SeatFeed(db)
+
+def book_session(schedule_id, name, email):
+    """Book through the group-commit writer when it is enabled."""
+    if booking_writer is not None:
+        return booking_writer.book(schedule_id, name, email)
+    return db.book_session(schedule_id, name, email)
 
 # Routes
 @app.route('/')
 def index():
     return redirect(url_for('schedule'))
 
+def schedule_validators(*key):
+    """ETag and Last-Modified for a schedule view, without querying the schedule."""
+    version, updated_at = db.get_data_version(max_age=VERSION_MAX_AGE)
+    today = datetime.now()
+    # The visible window moves at midnight even when nothing was written
+    midnight = today.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+    last_modified = max(parse_timestamp(updated_at), midnight)
+    return make_etag(version, today.strftime('%Y-%m-%d'), *key), last_modified
+
+def schedule_filters():
+    """Read the ?q=, ?band= and ?available= filters; band is None if unknown."""
+    text = (request.args.get('q') or '').strip()
+    band = request.args.get('band') or None
+    available = request.args.get('available') in ('1', 'true', 'on')
+    return text, band, available
+
+def search_schedule(start, end, text, band, available):
+    """Rows between start and end matching the filters (all of them if none are set)."""
+    if not (text or band or available):
+        return db.get_schedule_range(start, end)
+    time_from, time_to = TIME_BANDS.get(band, (None, None))
+    return db.search_schedules(text, start, end, time_from, time_to, available)
+
 @app.route('/schedule')
 def schedule():
-    upcoming_schedule = db.get_upcoming_schedule(14)  # Get schedule for next 14 days
+    text, band, available = schedule_filters()
+    if band not in TIME_BANDS:
+        band = None
+    filters = (text, band, available)
+    
+    # Flashed messages are part of the page, so never answer 304 over them
+    conditional = '_flashes' not in session
+    if conditional:
+        etag, last_modified = schedule_validators('schedule', *filters)
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
+    
+    # Get schedule for next 14 days
+    today = datetime.now()
+    upcoming_schedule = search_schedule(
+        today.strftime('%Y-%m-%d'), (today + timedelta(days=SCHEDULE_DAYS)).strftime('%Y-%m-%d'), *filters
+    )
     
     # Group by date
     schedule_by_date = {}
-    for session in upcoming_schedule:
-        date = session[2]  # date is at index 2
+    for session_row in upcoming_schedule:
+        date = session_row.date
         if date not in schedule_by_date:
             schedule_by_date[date] = []
-        schedule_by_date[date].append(session)
+        schedule_by_date[date].append(session_row)
     
-    return render_template('customer_schedule.html', schedule_by_date=schedule_by_date)
+    day_fragments = [
+        render_fragment(day_fragment_cache, (date, *filters), tuple(sessions), 'customer_schedule_day.html',
+                        date=date, sessions=sessions)
+        for date, sessions in schedule_by_date.items()
+    ]
+    html = render_template('customer_schedule.html', day_fragments=day_fragments,
+                           q=text, band=band, available=available, time_bands=TIME_BANDS)
+    if not conditional:
+        return html
+    return cached_response(html, 'text/html', etag, last_modified)
+
+@app.route('/api/schedule')
+def api_schedule():
+    today = datetime.now()
+    start = request.args.get('start') or today.strftime('%Y-%m-%d')
+    end = request.args.get('end') or (today + timedelta(days=SCHEDULE_DAYS)).strftime('%Y-%m-%d')
+    try:
+        span = (datetime.strptime(end, '%Y-%m-%d') - datetime.strptime(start, '%Y-%m-%d')).days
+    except ValueError:
+        return jsonify({'success': False, 'message': 'start and end must be YYYY-MM-DD'}), 400
+    if span < 0 or span > MAX_API_RANGE_DAYS:
+        return jsonify({'success': False,
+                        'message': f'Date range must be 0 to {MAX_API_RANGE_DAYS} days'}), 400
+    text, band, available = schedule_filters()
+    if band is not None and band not in TIME_BANDS:
+        return jsonify({'success': False,
+                        'message': f"band must be one of {', '.join(TIME_BANDS)}"}), 400
+    
+    etag, last_modified = schedule_validators('api_schedule', start, end, text, band, available)
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    
+    rows = search_schedule(start, end, text, band, available)
+    body = json.dumps({
+        'start': start,
+        'end': end,
+        'columns': API_SCHEDULE_COLUMNS,
+        'sessions': [list(row) for row in rows],
+    }, separators=(',', ':'))
+    return cached_response(body, 'application/json', etag, last_modified)
 
 @app.route('/book/<int:schedule_id>', methods=['GET', 'POST'])
 def book(schedule_id):
@@ -35,24 +172,107 @@ def book(schedule_id):
         flash('Session not found!', 'error')
         return redirect(url_for('schedule'))
     
-    if session_data[5] >= session_data[4]:  # If booked_count >= capacity
-        flash('This session is already full!', 'error')
-        return redirect(url_for('schedule'))
+    if session_data.is_full:
+        flash('This session is full, but you can join the waitlist.', 'error')
+        return redirect(url_for('waitlist', schedule_id=schedule_id))
     
     if request.method == 'POST':
         name = request.form.get('name')
         email = request.form.get('email')
         
-        success, message = db.book_session(schedule_id, name, email)
+        success, message = book_session(schedule_id, name, email)
         
         if success:
             flash('Booking successful!', 'success')
             return redirect(url_for('schedule'))
+        elif message == 'Already booked':
+            flash('You have already booked this session.', 'info')
+            return redirect(url_for('my_bookings', email=email))
+        elif message == 'Session is full':
+            flash('Someone took the last seat, but you can join the waitlist.', 'error')
+            return redirect(url_for('waitlist', schedule_id=schedule_id))
         else:
             flash(f'Booking failed: {message}', 'error')
     
     return render_template('customer_book.html', session=session_data)
 
+@app.route('/waitlist/<int:schedule_id>', methods=['GET', 'POST'])
+def waitlist(schedule_id):
+    session_data = db.get_schedule_by_id(schedule_id)
+    
+    if not session_data:
+        flash('Session not found!', 'error')
+        return redirect(url_for('schedule'))
+    
+    if request.method == 'POST':
+        name = request.form.get('name')
+        email = request.form.get('email')
+        
+        success, message = db.join_waitlist(schedule_id, name, email)
+        
+        if success or message == 'Already on the waitlist':
+            return redirect(url_for('waitlist', schedule_id=schedule_id, email=email))
+        if message == 'Already booked':
+            flash('You already have a seat in this session.', 'info')
+            return redirect(url_for('my_bookings', email=email))
+        if message.startswith('Session has free seats'):
+            flash('A seat just opened up - you can book it now!', 'success')
+            return redirect(url_for('book', schedule_id=schedule_id))
+        flash(f'Could not join the waitlist: {message}', 'error')
+    
+    email = request.args.get('email')
+    position = db.get_waitlist_position(schedule_id, email) if email else None
+    return render_template('customer_waitlist.html', session=session_data,
+                           email=email, position=position)
+
+@app.route('/waitlist/<int:schedule_id>/leave', methods=['POST'])
+def leave_waitlist(schedule_id):
+    if db.leave_waitlist(schedule_id, request.form.get('email')):
+        flash('You have left the waitlist.', 'success')
+    else:
+        flash('You are not on the waitlist for this session.', 'error')
+    return redirect(url_for('schedule'))
+
+@app.route('/cancel/<int:schedule_id>', methods=['GET', 'POST'])
+def cancel(schedule_id):
+    session_data = db.get_schedule_by_id(schedule_id)
+    
+    if not session_data:
+        flash('Session not found!', 'error')
+        return redirect(url_for('schedule'))
+    
+    if request.method == 'POST':
+        success, message = db.cancel_booking(schedule_id, request.form.get('email'))
+        
+        if success:
+            flash('Your booking has been cancelled.', 'success')
+            return redirect(url_for('schedule'))
+        else:
+            flash(f'Cancellation failed: {message}', 'error')
+    
+    return render_template('customer_cancel.html', session=session_data)
+
+@app.route('/my-bookings')
+def my_bookings():
+    email = request.args.get('email')
+    upcoming, past = db.get_customer_bookings(email, PAST_BOOKINGS_LIMIT) if email else ([], [])
+    return render_template('customer_my_bookings.html', email=email, upcoming=upcoming, past=past)
+
+@app.route('/api/bookings')
+def api_bookings():
+    email = request.args.get('email')
+    if not email:
+        return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+    
+    upcoming, past = db.get_customer_bookings(email, PAST_BOOKINGS_LIMIT)
+    return jsonify({
+        'success': True,
+        'email': email,
+        'columns': API_BOOKING_COLUMNS,
+        'upcoming': [list(row) for row in upcoming],
+        'past': [list(row) for row in past],
+    })
+
 @app.route('/api/book', methods=['POST'])
 def api_book():
     data = request.get_json()
@@ -63,18 +283,128 @@ def api_book():
     if not all([schedule_id, name, email]):
         return jsonify({'success': False, 'message': 'Missing required fields'}), 400
     
-    success, message = db.book_session(schedule_id, name, email)
+    success, message = book_session(schedule_id, name, email)
     
     if success:
         return jsonify({'success': True, 'message': 'Booking successful'})
     else:
         return jsonify({'success': False, 'message': message}), 400
 
+@app.route('/api/bookings/cancel', methods=['POST'])
+def api_cancel_booking():
+    data = request.get_json(silent=True) or {}
+    schedule_id = data.get('schedule_id')
+    email = data.get('email')
+    
+    if not all([schedule_id, email]):
+        return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+    
+    success, message = db.cancel_booking(schedule_id, email)
+    
+    if success:
+        return jsonify({'success': True, 'message': message})
+    else:
+        return jsonify({'success': False, 'message': message}), 400
+
+@app.route('/api/waitlist', methods=['POST'])
+def api_join_waitlist():
+    data = request.get_json(silent=True) or {}
+    schedule_id = data.get('schedule_id')
+    name = data.get('name')
+    email = data.get('email')
+    
+    if not all([schedule_id, name, email]):
+        return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+    
+    success, message = db.join_waitlist(schedule_id, name, email)
+    
+    if success:
+        return jsonify({'success': True, 'message': message,
+                        'position': db.get_waitlist_position(schedule_id, email)})
+    else:
+        return jsonify({'success': False, 'message': message}), 400
+
+@app.route('/api/waitlist/position')
+def api_waitlist_position():
+    schedule_id = request.args.get('schedule_id', type=int)
+    email = request.args.get('email')
+    
+    if not all([schedule_id, email]):
+        return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+    
+    position = db.get_waitlist_position(schedule_id, email)
+    if position is None:
+        return jsonify({'success': False, 'message': 'Not on the waitlist'}), 404
+    return jsonify({'success': True, 'schedule_id': schedule_id, 'position': position})
+
+@app.route('/api/book/batch', methods=['POST'])
+def api_book_batch():
+    data = request.get_json(silent=True) or {}
+    items = data.get('bookings')
+    mode = data.get('mode', 'atomic')
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'bookings must be a non-empty list'}), 400
+    if len(items) > MAX_BATCH_BOOKINGS:
+        return jsonify({'success': False,
+                        'message': f'At most {MAX_BATCH_BOOKINGS} bookings per batch'}), 400
+    if mode not in ('atomic', 'best_effort'):
+        return jsonify({'success': False, 'message': "mode must be 'atomic' or 'best_effort'"}), 400
+    
+    # Validate every item up front; invalid items never reach the database
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            booking = {
+                'schedule_id': int(item['schedule_id']),
+                'name': item['name'],
+                'email': item['email'],
+            }
+        except (KeyError, TypeError, ValueError):
+            booking = None
+        if (booking is None or not booking['schedule_id']
+                or not all(isinstance(booking[field], str) and booking[field].strip()
+                           for field in ('name', 'email'))):
+            results[index] = (False, 'Missing required fields')
+        else:
+            valid.append((index, booking))
+    
+    if mode == 'atomic' and len(valid) < len(items):
+        results = [r or (False, 'Not booked: another booking in the batch failed') for r in results]
+    elif valid:
+        _, outcomes = db.book_many([booking for _, booking in valid], atomic=(mode == 'atomic'))
+        for (index, _), outcome in zip(valid, outcomes):
+            results[index] = outcome
+    
+    booked = sum(1 for ok, _ in results if ok)
+    response = {
+        'success': booked == len(items),
+        'mode': mode,
+        'booked': booked,
+        'results': [
+            {'index': index, 'schedule_id': item.get('schedule_id') if isinstance(item, dict) else None,
+             'success': ok, 'message': message}
+            for index, (item, (ok, message)) in enumerate(zip(items, results))
+        ],
+    }
+    return jsonify(response), (200 if booked else 400)
+
+@app.route('/api/seats/stream')
+def seat_stream():
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(
+        seat_feed.stream(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 # Create customer templates
 
 if __name__ == '__main__':
     # Make sure database exists
-    if not os.path.exists("gym_schedule.db"):
+    if not os.path.exists(DB_PATH):
         db.initialize_sample_data()
         print("Database initialized with sample data.")
+    # Development server; production runs under serve.py (python serve.py customer)
     app.run(debug=True, host='0.0.0.0', port=5004)
\ No newline at end of file
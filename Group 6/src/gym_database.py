@@ -1,68 +1,264 @@
+import bisect
+import heapq
+import json
 import sqlite3
 import os
+import queue
+import re
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+import migrations
+from query_cache import QueryCache, cached_read
+from rows import (Booking, BookingDetail, CountDrift, CustomerBooking, RecurrenceRule, Schedule, SeatChange,
+                  Utilization, WaitlistEntry, query, slot_end)
+
+DEFAULT_DURATION = 60
+
+
+def valid_slot(date, time, duration):
+    """True if date is YYYY-MM-DD, time is an HH:MM start within the day and duration is positive."""
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+        return (re.fullmatch(r"\d{4}-\d{2}-\d{2}", date) is not None
+                and re.fullmatch(r"([01]\d|2[0-3]):[0-5]\d", time) is not None
+                and int(duration) > 0)
+    except (TypeError, ValueError):
+        return False
+
+
+def _minute_of(date, time):
+    """Minutes since 0001-01-01 00:00 of time (HH:MM, may run past 24:00) on date."""
+    hours, minutes = time.split(":")
+    return datetime.strptime(date, "%Y-%m-%d").toordinal() * 1440 + int(hours) * 60 + int(minutes)
+
+
+def _day_of(minute):
+    """The YYYY-MM-DD date an absolute minute from _minute_of falls on."""
+    return datetime.fromordinal(minute // 1440).strftime("%Y-%m-%d")
+
+
+def normalize_email(email):
+    """Trim and lower-case an email, the form every customer_email is stored in."""
+    return email.strip().lower() if isinstance(email, str) else email
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix.
+
+    Only word characters are kept, so user input can never be parsed as
+    FTS5 syntax. Returns None when the text has no words.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+class ConnectionPool:
+    """A small pool of SQLite connections shared by the request threads.
+    
+    Each caller checks out its own connection for the duration of one
+    operation, so cursors and transactions never leak between threads.
+    Connections run in WAL mode, which lets readers proceed while a writer
+    holds the write lock.
+    """
+    
+    def __init__(self, db_name, size=8, busy_timeout=5000, cache_size=-16000, attach=None):
+        self.db_name = db_name
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+        # {schema name: path} of extra databases attached to every connection
+        self.attach = dict(attach or {})
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._wal_checked = False
+        # Process that opened the idle connections; see reset()
+        self._pid = os.getpid()
+        self._inherited = []
+        # Called with every sqlite3.Error raised while a connection is out
+        self.on_error = None
+    
+    def _connect(self):
+        """Open a new connection and apply the performance pragmas."""
+        # isolation_level="IMMEDIATE" makes every implicit write transaction
+        # take the write lock up front instead of failing to upgrade later
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.busy_timeout / 1000,
+            isolation_level="IMMEDIATE",
+            check_same_thread=False,
+        )
+        for schema, path in self.attach.items():
+            conn.execute("ATTACH DATABASE ? AS ?", (path, schema))
+        if not self._wal_checked:
+            # journal_mode is stored in the database file, so once is enough.
+            # auto_vacuum only takes effect on a new, empty file and must be
+            # set before WAL mode writes the header; it lets archiving hand
+            # freed pages back to the filesystem.
+            for schema in ["main", *self.attach]:
+                conn.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+                conn.execute(f"PRAGMA {schema}.journal_mode = WAL")
+            self._wal_checked = True
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        # NORMAL is durable across application crashes in WAL mode
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Check out a connection, returning it to the pool afterwards."""
+        if self._pid != os.getpid():
+            self.reset()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except sqlite3.Error as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def reset(self):
+        """Drop the idle connections inherited from a parent process.
+
+        A SQLite connection must not be used across fork(), and closing it in
+        the child is not safe either: the child does not hold the parent's
+        POSIX locks, so a close could checkpoint and remove a WAL file the
+        parent is still using. The inherited connections are kept referenced
+        (so they are never closed) and new ones are opened on demand.
+        connection() calls this by itself when it notices a new process id.
+        """
+        while True:
+            try:
+                self._inherited.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._pid = os.getpid()
+    
+    def close(self):
+        """Close every idle connection."""
+        if self._pid != os.getpid():
+            self.reset()
+            return
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 class GymDatabase:
-    def __init__(self, db_name="gym_schedule.db"):
-        """Initialize the database connection and create tables if they don't exist."""
+    def __init__(self, db_name="gym_schedule.db", pool_size=8, cache_entries=256, cache_ttl=30.0,
+                 archive_db=None):
+        """Initialize the connection pool and create tables if they don't exist.
+        
+        Schedule reads are cached per process (cache_entries=0 disables this)
+        and invalidated through the data_version table. Archived sessions live
+        in archive_db, attached as "archive"; it defaults to a file next to
+        db_name (gym_schedule_archive.db for gym_schedule.db).
+        """
         self.db_name = db_name
-        # Add check_same_thread=False to allow SQLite connection to be used across threads
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        if archive_db is None:
+            root, ext = os.path.splitext(db_name)
+            archive_db = f"{root}_archive{ext or '.db'}"
+        self.archive_db = archive_db
+        self.pool = ConnectionPool(db_name, size=pool_size, attach={"archive": archive_db})
+        self.cache = QueryCache(cache_entries, cache_ttl) if cache_entries else None
+        self._last_version = None  # (monotonic time read, (version, updated_at))
         self.create_tables()
     
     def create_tables(self):
         """Create the necessary tables if they don't exist."""
-        # Create schedule table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS schedule (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            date TEXT NOT NULL,
-            time TEXT NOT NULL,
-            capacity INTEGER DEFAULT 20,
-            booked_count INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Create admin table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admin (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-        ''')
-        
-        # Create bookings table to track who booked what
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS bookings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            schedule_id INTEGER NOT NULL,
-            customer_name TEXT NOT NULL,
-            customer_email TEXT NOT NULL,
-            booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (schedule_id) REFERENCES schedule (id)
-        )
-        ''')
-        
-        # Check if admin exists, if not create default admin
-        self.cursor.execute("SELECT COUNT(*) FROM admin")
-        if self.cursor.fetchone()[0] == 0:
-            self.cursor.execute("INSERT INTO admin (username, password) VALUES (?, ?)", 
-                              ("admin", "admin123"))  # In production, use hashed passwords
-        
-        self.conn.commit()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            # Create schedule table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schedule (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                date TEXT NOT NULL,
+                time TEXT NOT NULL,
+                capacity INTEGER DEFAULT 20,
+                booked_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            
+            # Create admin table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS admin (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL
+            )
+            ''')
+            
+            # Create bookings table to track who booked what
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                schedule_id INTEGER NOT NULL,
+                customer_name TEXT NOT NULL,
+                customer_email TEXT NOT NULL,
+                booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (schedule_id) REFERENCES schedule (id)
+            )
+            ''')
+            
+            # Keep booked_count in step with the bookings table. The increment runs
+            # inside the same statement as the INSERT, so a seat is taken atomically.
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bookings_after_insert
+            AFTER INSERT ON bookings
+            BEGIN
+                UPDATE schedule SET booked_count = booked_count + 1 WHERE id = NEW.schedule_id;
+            END
+            ''')
+            
+            # Check if admin exists, if not create default admin
+            cursor.execute("SELECT COUNT(*) FROM admin")
+            if cursor.fetchone()[0] == 0:
+                cursor.execute("INSERT INTO admin (username, password) VALUES (?, ?)", 
+                               ("admin", "admin123"))  # In production, use hashed passwords
+            
+            conn.commit()
+            
+            # Bring older database files up to the current schema version
+            migrations.migrate(conn)
+            
+            for statement in migrations.ARCHIVE_TABLES:
+                cursor.execute(statement)
+            conn.commit()
     
-    def add_schedule(self, name, date, time, capacity=20):
-        """Add a new schedule entry."""
+    def add_schedule(self, name, date, time, capacity=20, duration=DEFAULT_DURATION):
+        """Add a new schedule entry.
+        
+        Refused (returns False) if the date or time is malformed or it would
+        overlap another session; use find_overlaps to find out which one.
+        """
+        if not valid_slot(date, time, duration):
+            return False
         try:
-            self.cursor.execute(
-                "INSERT INTO schedule (name, date, time, capacity) VALUES (?, ?, ?, ?)",
-                (name, date, time, capacity)
-            )
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if self._find_overlaps(conn, [(name, date, time, duration)]):
+                    conn.rollback()
+                    return False
+                conn.execute(
+                    "INSERT INTO schedule (name, date, time, capacity, duration) VALUES (?, ?, ?, ?, ?)",
+                    (name, date, time, capacity, duration)
+                )
+                conn.commit()
             return True
         except sqlite3.Error as e:
             print(f"Database error: {e}")
@@ -70,27 +266,210 @@ class GymDatabase:
     
     def get_all_schedules(self):
         """Get all schedule entries."""
-        self.cursor.execute(
-            "SELECT id, name, date, time, capacity, booked_count FROM schedule ORDER BY date, time"
-        )
-        return self.cursor.fetchall()
+        with self.pool.connection() as conn:
+            return query(
+                conn, Schedule,
+                """
+                SELECT id, name, date, time, capacity, booked_count, duration
+                FROM schedule
+                ORDER BY date, time
+                """
+            ).fetchall()
+    
+    def add_schedules(self, rows):
+        """Add many (name, date, time, capacity[, duration]) entries in one transaction.
+        
+        The whole batch is checked against itself and the existing schedule in
+        one pass; rows that would overlap an existing session or an earlier
+        row are left out, as are rows with a malformed date or time. Returns
+        (added, conflicts, invalid) where conflicts is the find_overlaps
+        result for the batch and invalid lists the indexes of malformed rows.
+        """
+        rows = [tuple(row) + (DEFAULT_DURATION,) * (5 - len(row)) for row in rows]
+        invalid = [index for index, (_, d, t, _, dur) in enumerate(rows) if not valid_slot(d, t, dur)]
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conflicts = self._find_overlaps(conn, [(n, d, t, dur) for n, d, t, _, dur in rows])
+                rejected = {index for index, *_ in conflicts}.union(invalid)
+                cursor = conn.executemany(
+                    "INSERT INTO schedule (name, date, time, capacity, duration) VALUES (?, ?, ?, ?, ?)",
+                    [row for index, row in enumerate(rows) if index not in rejected]
+                )
+                conn.commit()
+            return max(cursor.rowcount, 0), conflicts, invalid
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return 0, [], invalid
+    
+    def find_overlaps(self, slots, exclude_id=None):
+        """Check proposed (name, date, time, duration) slots for overlaps.
+        
+        See _find_overlaps. exclude_id leaves one existing session out of the
+        check, for when that session is the one being edited.
+        """
+        with self.pool.connection() as conn:
+            return self._find_overlaps(conn, slots, exclude_id)
     
+    def _find_overlaps(self, conn, slots, exclude_id=None):
+        """Find the proposed slots that overlap an existing session or an earlier proposal.
+        
+        Slots are compared on absolute minutes, so sessions running past
+        midnight clash with the next morning. Of two clashing proposals the
+        earlier one in slots is kept and only the later one reported;
+        malformed slots are ignored. Returns (index, name, date, time,
+        end_time) per rejected slot, naming the session it overlaps.
+        """
+        proposed = []
+        days = set()
+        for index, (name, date, time, duration) in enumerate(slots):
+            if not valid_slot(date, time, duration):
+                continue
+            start = _minute_of(date, time)
+            end = start + int(duration)
+            proposed.append((start, end, date, time, slot_end(time, duration), index, name))
+            # Every day the slot touches, so sessions early the next day are compared too
+            days.update(_day_of(minute) for minute in range(start - start % 1440, end, 1440))
+        if not proposed:
+            return []
+        before = {_day_of(_minute_of(day, "00:00") - 1440) for day in days} - days
+        existing = [
+            (_minute_of(date, time), _minute_of(date, end_time), date, time, end_time, None, name)
+            for schedule_id, name, date, time, end_time in conn.execute(
+                migrations.FIND_OVERLAPS_SQL, (json.dumps(sorted(days)), json.dumps(sorted(before)))
+            )
+            if schedule_id != exclude_id
+        ]
+        
+        # Sweep the proposals against the existing sessions, which may overlap each other
+        conflicts = {}
+        reach = None  # existing session ending furthest so far
+        running = []  # (end, index) heap of proposals not yet found to clash
+        existing.sort()
+        proposed.sort()
+        # Existing sessions go first on a tie, so one starting with a proposal is seen
+        for slot in heapq.merge(existing, proposed, key=lambda slot: (slot[0], slot[5] is not None)):
+            start, end, date, time, end_time, index, name = slot
+            if index is None:
+                # Every proposal still running when this session starts overlaps it
+                while running and running[0][0] <= start:
+                    heapq.heappop(running)
+                for _, other in running:
+                    conflicts[other] = (other, name, date, time, end_time)
+                running.clear()
+                if not reach or end > reach[1]:
+                    reach = slot
+            elif reach and start < reach[1]:
+                conflicts[index] = (index, reach[6], reach[2], reach[3], reach[4])
+            else:
+                heapq.heappush(running, (end, index))
+        
+        # Then keep the remaining proposals in order, as long as they miss every kept one
+        starts, kept = [], []
+        for slot in sorted(proposed, key=lambda slot: slot[5]):
+            start, end, index = slot[0], slot[1], slot[5]
+            if index in conflicts:
+                continue
+            position = bisect.bisect_right(starts, start)
+            if position and kept[position - 1][1] > start:
+                other = kept[position - 1]
+            elif position < len(kept) and kept[position][0] < end:
+                other = kept[position]
+            else:
+                starts.insert(position, start)
+                kept.insert(position, slot)
+                continue
+            conflicts[index] = (index, other[6], other[2], other[3], other[4])
+        return [conflicts[index] for index in sorted(conflicts)]
+    
+    def get_schedules_page(self, after=None, limit=50, date_from=None, date_to=None,
+                           name=None, availability=None):
+        """Get one page of schedule entries ordered by (date, time, id).
+        
+        Uses keyset pagination: after is the (date, time, id) of the last row
+        of the previous page, so every page is an index seek no matter how
+        deep it is. name matches part of the class name and availability is
+        'full' or 'open'. Returns (rows, next_after); next_after is None on
+        the last page.
+        """
+        conditions = []
+        params = []
+        if after is not None:
+            # The cursor already lies at or past date_from
+            conditions.append("(date, time, id) > (?, ?, ?)")
+            params.extend(after)
+        elif date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if name:
+            conditions.append("name LIKE ?")
+            params.append(f"%{name}%")
+        if availability == "full":
+            conditions.append("booked_count >= capacity")
+        elif availability == "open":
+            conditions.append("booked_count < capacity")
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.pool.connection() as conn:
+            rows = query(
+                conn, Schedule,
+                f"""
+                SELECT id, name, date, time, capacity, booked_count, duration
+                FROM schedule
+                {where}
+                ORDER BY date, time, id
+                LIMIT ?
+                """,
+                params + [limit + 1]
+            ).fetchall()
+        
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            return rows, (last.date, last.time, last.id)
+        return rows, None
+    
+    @cached_read
     def get_schedule_by_id(self, schedule_id):
         """Get a specific schedule entry by ID."""
-        self.cursor.execute(
-            "SELECT id, name, date, time, capacity, booked_count FROM schedule WHERE id = ?",
-            (schedule_id,)
-        )
-        return self.cursor.fetchone()
+        with self.pool.connection() as conn:
+            return query(
+                conn, Schedule,
+                "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule WHERE id = ?",
+                (schedule_id,)
+            ).fetchone()
     
-    def update_schedule(self, schedule_id, name, date, time, capacity):
-        """Update an existing schedule entry."""
+    def update_schedule(self, schedule_id, name, date, time, capacity, duration=None):
+        """Update an existing schedule entry.
+        
+        duration=None keeps the current duration. Refused (returns False) if
+        the date or time is malformed or the new slot would overlap another
+        session.
+        """
+        if not valid_slot(date, time, duration or DEFAULT_DURATION):
+            return False
         try:
-            self.cursor.execute(
-                "UPDATE schedule SET name = ?, date = ?, time = ?, capacity = ? WHERE id = ?",
-                (name, date, time, capacity, schedule_id)
-            )
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if duration is None:
+                    row = conn.execute("SELECT duration FROM schedule WHERE id = ?", (schedule_id,)).fetchone()
+                    duration = row[0] if row else DEFAULT_DURATION
+                if self._find_overlaps(conn, [(name, date, time, duration)], exclude_id=schedule_id):
+                    conn.rollback()
+                    return False
+                conn.execute(
+                    """
+                    UPDATE schedule SET name = ?, date = ?, time = ?, capacity = ?, duration = ?
+                    WHERE id = ?
+                    """,
+                    (name, date, time, capacity, duration, schedule_id)
+                )
+                # A larger capacity frees seats for people already waiting
+                self._promote_waitlist(conn, schedule_id)
+                conn.commit()
             return True
         except sqlite3.Error as e:
             print(f"Database error: {e}")
@@ -99,111 +478,947 @@ class GymDatabase:
     def delete_schedule(self, schedule_id):
         """Delete a schedule entry."""
         try:
-            # First check if there are any bookings
-            self.cursor.execute("SELECT COUNT(*) FROM bookings WHERE schedule_id = ?", (schedule_id,))
-            if self.cursor.fetchone()[0] > 0:
-                # Delete associated bookings first
-                self.cursor.execute("DELETE FROM bookings WHERE schedule_id = ?", (schedule_id,))
-            
-            # Then delete the schedule
-            self.cursor.execute("DELETE FROM schedule WHERE id = ?", (schedule_id,))
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                # Delete the schedule first so bookings_after_delete has no
+                # seat count left to update for each removed booking
+                conn.execute("DELETE FROM schedule WHERE id = ?", (schedule_id,))
+                conn.execute("DELETE FROM bookings WHERE schedule_id = ?", (schedule_id,))
+                conn.execute("DELETE FROM waitlist WHERE schedule_id = ?", (schedule_id,))
+                conn.commit()
             return True
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return False
     
     def book_session(self, schedule_id, customer_name, customer_email):
-        """Book a session for a customer."""
+        """Book a session for a customer.
+        
+        The capacity check and the insert happen in a single statement: the
+        booking row is only written if the session still has a free seat, and
+        the bookings_after_insert trigger takes that seat. Concurrent callers
+        can therefore never overbook a session. A second booking by the same
+        email is rejected by the unique idx_bookings_customer index.
+        """
+        customer_email = normalize_email(customer_email)
         try:
-            # Check if there's capacity
-            self.cursor.execute(
-                "SELECT capacity, booked_count FROM schedule WHERE id = ?",
-                (schedule_id,)
-            )
-            result = self.cursor.fetchone()
-            if not result:
-                return False, "Schedule not found"
-            
-            capacity, booked_count = result
-            if booked_count >= capacity:
+            with self.pool.connection() as conn:
+                cursor = conn.execute(
+                    """
+                    INSERT INTO bookings (schedule_id, customer_name, customer_email)
+                    SELECT id, ?, ? FROM schedule
+                    WHERE id = ? AND booked_count < capacity
+                    """,
+                    (customer_name, customer_email, schedule_id)
+                )
+                booked = cursor.rowcount == 1
+                conn.commit()
+                if booked:
+                    return True, "Booking successful"
+                
+                # Nothing was inserted: find out why (only on the failure path)
+                cursor.execute(
+                    """
+                    SELECT EXISTS (SELECT 1 FROM bookings
+                                   WHERE customer_email = ? AND schedule_id = schedule.id)
+                    FROM schedule WHERE id = ?
+                    """,
+                    (customer_email, schedule_id)
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    return False, "Schedule not found"
+                if row[0]:
+                    return False, "Already booked"
                 return False, "Session is full"
-            
-            # Add booking
-            self.cursor.execute(
-                "INSERT INTO bookings (schedule_id, customer_name, customer_email) VALUES (?, ?, ?)",
-                (schedule_id, customer_name, customer_email)
-            )
-            
-            # Update booked count
-            self.cursor.execute(
-                "UPDATE schedule SET booked_count = booked_count + 1 WHERE id = ?",
-                (schedule_id,)
-            )
-            
-            self.conn.commit()
-            return True, "Booking successful"
+        except sqlite3.IntegrityError:
+            return False, "Already booked"
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False, f"Database error: {str(e)}"
+    
+    def book_many(self, bookings, atomic=True):
+        """Book several sessions in one transaction.
+        
+        bookings is a list of dicts with schedule_id, name and email. Seats are
+        counted once per session under the write lock and all accepted rows go
+        in with a single executemany. Returns (success, results) where results
+        holds a (success, message) pair per item, in input order.
+        
+        With atomic=True nothing is written unless every item can be booked;
+        otherwise the items that fit are booked and the rest are reported.
+        """
+        if not bookings:
+            return True, []
+        bookings = [dict(item, email=normalize_email(item["email"])) for item in bookings]
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                schedule_ids = sorted({item["schedule_id"] for item in bookings})
+                placeholders = ", ".join("?" * len(schedule_ids))
+                seats_left = dict(conn.execute(
+                    f"SELECT id, capacity - booked_count FROM schedule WHERE id IN ({placeholders})",
+                    schedule_ids
+                ))
+                # Existing bookings by the same emails, found through idx_bookings_customer;
+                # pairs accepted from this batch are added as they go
+                emails = list({item["email"] for item in bookings})
+                booked = set(conn.execute(
+                    f"""
+                    SELECT schedule_id, customer_email FROM bookings
+                    WHERE customer_email IN ({", ".join("?" * len(emails))})
+                    """,
+                    emails
+                ))
+                
+                results = []
+                accepted = []
+                for item in bookings:
+                    schedule_id = item["schedule_id"]
+                    if schedule_id not in seats_left:
+                        results.append((False, "Schedule not found"))
+                    elif (schedule_id, item["email"]) in booked:
+                        results.append((False, "Already booked"))
+                    elif seats_left[schedule_id] <= 0:
+                        results.append((False, "Session is full"))
+                    else:
+                        seats_left[schedule_id] -= 1
+                        booked.add((schedule_id, item["email"]))
+                        accepted.append((schedule_id, item["name"], item["email"]))
+                        results.append((True, "Booking successful"))
+                
+                if atomic and len(accepted) < len(bookings):
+                    conn.rollback()
+                    results = [
+                        (False, "Not booked: another booking in the batch failed") if ok else (ok, message)
+                        for ok, message in results
+                    ]
+                    return False, results
+                
+                conn.executemany(
+                    "INSERT INTO bookings (schedule_id, customer_name, customer_email) VALUES (?, ?, ?)",
+                    accepted
+                )
+                conn.commit()
+            return len(accepted) == len(bookings), results
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False, [(False, f"Database error: {str(e)}")] * len(bookings)
+    
+    def cancel_booking(self, schedule_id, customer_email):
+        """Cancel a customer's booking for a session.
+        
+        The freed seat goes to the head of the session's waitlist in the same
+        transaction, so no other booking can take it in between. Returns
+        (success, message).
+        """
+        customer_email = normalize_email(customer_email)
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.execute(
+                    """
+                    DELETE FROM bookings WHERE id = (
+                        SELECT id FROM bookings
+                        WHERE schedule_id = ? AND customer_email = ?
+                        ORDER BY id LIMIT 1
+                    )
+                    """,
+                    (schedule_id, customer_email)
+                )
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return False, "Booking not found"
+                
+                promoted = self._promote_waitlist(conn, schedule_id)
+                conn.commit()
+            if promoted:
+                return True, "Booking cancelled; the seat went to the next person on the waitlist"
+            return True, "Booking cancelled"
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False, f"Database error: {str(e)}"
+    
+    def _promote_waitlist(self, conn, schedule_id):
+        """Fill free seats from the waitlist; see migrations.promote_waitlist."""
+        return migrations.promote_waitlist(conn, schedule_id)
+    
+    def join_waitlist(self, schedule_id, customer_name, customer_email):
+        """Add a customer to the end of a full session's waitlist.
+        
+        Returns (success, message). Joining is refused while the session still
+        has free seats, since the customer can simply book one, and when the
+        customer already has a seat.
+        """
+        customer_email = normalize_email(customer_email)
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    """
+                    SELECT capacity - booked_count,
+                           EXISTS (SELECT 1 FROM bookings
+                                   WHERE customer_email = ? AND schedule_id = schedule.id)
+                    FROM schedule WHERE id = ?
+                    """,
+                    (customer_email, schedule_id)
+                ).fetchone()
+                if row is None:
+                    conn.rollback()
+                    return False, "Schedule not found"
+                if row[1]:
+                    conn.rollback()
+                    return False, "Already booked"
+                if row[0] > 0:
+                    conn.rollback()
+                    return False, "Session has free seats; book it instead"
+                conn.execute(
+                    "INSERT INTO waitlist (schedule_id, customer_name, customer_email) VALUES (?, ?, ?)",
+                    (schedule_id, customer_name, customer_email)
+                )
+                conn.commit()
+            return True, "Added to the waitlist"
+        except sqlite3.IntegrityError:
+            return False, "Already on the waitlist"
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return False, f"Database error: {str(e)}"
     
+    def leave_waitlist(self, schedule_id, customer_email):
+        """Remove a customer from a session's waitlist."""
+        customer_email = normalize_email(customer_email)
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.execute(
+                    "DELETE FROM waitlist WHERE schedule_id = ? AND customer_email = ?",
+                    (schedule_id, customer_email)
+                )
+                conn.commit()
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False
+    
+    def get_waitlist_position(self, schedule_id, customer_email):
+        """Get a customer's 1-based place in a session's waitlist, or None."""
+        customer_email = normalize_email(customer_email)
+        with self.pool.connection() as conn:
+            return conn.execute(
+                """
+                SELECT COUNT(*) FROM waitlist
+                WHERE schedule_id = ? AND id <= (
+                    SELECT id FROM waitlist WHERE schedule_id = ? AND customer_email = ?
+                )
+                """,
+                (schedule_id, schedule_id, customer_email)
+            ).fetchone()[0] or None
+    
+    def get_waitlist(self, schedule_id):
+        """Get a session's waitlist in join order."""
+        with self.pool.connection() as conn:
+            return query(
+                conn, WaitlistEntry,
+                """
+                SELECT id, customer_name, customer_email, joined_at
+                FROM waitlist
+                WHERE schedule_id = ?
+                ORDER BY id
+                """,
+                (schedule_id,)
+            ).fetchall()
+    
     def get_bookings_by_schedule(self, schedule_id):
         """Get all bookings for a specific schedule."""
-        self.cursor.execute(
-            """
-            SELECT b.id, b.customer_name, b.customer_email, b.booking_time 
-            FROM bookings b
-            WHERE b.schedule_id = ?
-            ORDER BY b.booking_time DESC
-            """,
-            (schedule_id,)
-        )
-        return self.cursor.fetchall()
+        with self.pool.connection() as conn:
+            return query(
+                conn, Booking,
+                """
+                SELECT b.id, b.customer_name, b.customer_email, b.booking_time 
+                FROM bookings b
+                WHERE b.schedule_id = ?
+                ORDER BY b.booking_time DESC
+                """,
+                (schedule_id,)
+            ).fetchall()
+    
+    def get_bookings_page(self, schedule_id, after=None, limit=50):
+        """Get one page of a session's bookings, newest first.
+        
+        after is the (booking_time, id) of the last booking on the previous
+        page. Returns (rows, next_after); next_after is None on the last page.
+        """
+        keyset = "AND (booking_time, id) < (?, ?)" if after is not None else ""
+        with self.pool.connection() as conn:
+            rows = query(
+                conn, Booking,
+                f"""
+                SELECT id, customer_name, customer_email, booking_time
+                FROM bookings
+                WHERE schedule_id = ? {keyset}
+                ORDER BY booking_time DESC, id DESC
+                LIMIT ?
+                """,
+                (schedule_id, *(after or ()), limit + 1)
+            ).fetchall()
+        
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, (rows[-1].booking_time, rows[-1].id)
+        return rows, None
+    
+    def iter_schedules(self, date_from=None, date_to=None, batch_size=1000):
+        """Yield schedule rows in (date, time, id) order, batch_size at a time.
+        
+        Rows are pulled with fetchmany, so memory stays flat however many rows
+        match. The pooled connection is held until the generator is exhausted
+        or closed.
+        """
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.pool.connection() as conn:
+            cursor = query(
+                conn, Schedule,
+                f"""
+                SELECT id, name, date, time, capacity, booked_count, duration
+                FROM schedule
+                {where}
+                ORDER BY date, time, id
+                """,
+                params
+            )
+            yield from self._iter_cursor(cursor, batch_size)
+    
+    def iter_bookings(self, date_from=None, date_to=None, schedule_id=None, batch_size=1000):
+        """Yield bookings with their session details, batch_size at a time.
+        
+        Filters by session date range and/or schedule_id. Rows come out in
+        session order and then booking order without a sort step, so the
+        query streams straight from the indexes.
+        """
+        conditions = []
+        params = []
+        if schedule_id is not None:
+            conditions.append("s.id = ?")
+            params.append(schedule_id)
+        if date_from:
+            conditions.append("s.date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("s.date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.pool.connection() as conn:
+            cursor = query(
+                conn, BookingDetail,
+                f"""
+                SELECT b.id, s.id, s.name, s.date, s.time,
+                       b.customer_name, b.customer_email, b.booking_time
+                FROM schedule s
+                JOIN bookings b ON b.schedule_id = s.id
+                {where}
+                ORDER BY s.date, s.time, s.id, b.booking_time, b.id
+                """,
+                params
+            )
+            yield from self._iter_cursor(cursor, batch_size)
+    
+    @staticmethod
+    def _iter_cursor(cursor, batch_size):
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
     
     def get_today_schedule(self):
         """Get today's schedule."""
-        today = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute(
-            """
-            SELECT id, name, date, time, capacity, booked_count 
-            FROM schedule 
-            WHERE date = ? 
-            ORDER BY time
-            """,
-            (today,)
-        )
-        return self.cursor.fetchall()
+        return self.get_schedule_for_date(datetime.now().strftime("%Y-%m-%d"))
     
     def get_upcoming_schedule(self, days=7):
         """Get upcoming schedule for the next X days."""
         today = datetime.now().strftime("%Y-%m-%d")
         end_date = (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
-        self.cursor.execute(
-            """
-            SELECT id, name, date, time, capacity, booked_count 
-            FROM schedule 
-            WHERE date BETWEEN ? AND ?
-            ORDER BY date, time
-            """,
-            (today, end_date)
-        )
-        return self.cursor.fetchall()
+        return self.get_schedule_range(today, end_date)
+    
+    @cached_read
+    def get_schedule_for_date(self, date):
+        """Get the schedule for a single date."""
+        with self.pool.connection() as conn:
+            return query(
+                conn, Schedule,
+                """
+                SELECT id, name, date, time, capacity, booked_count, duration 
+                FROM schedule 
+                WHERE date = ? 
+                ORDER BY time
+                """,
+                (date,)
+            ).fetchall()
+    
+    @cached_read
+    def get_schedule_range(self, start_date, end_date):
+        """Get the schedule between two dates, inclusive."""
+        with self.pool.connection() as conn:
+            return query(
+                conn, Schedule,
+                """
+                SELECT id, name, date, time, capacity, booked_count, duration 
+                FROM schedule 
+                WHERE date BETWEEN ? AND ?
+                ORDER BY date, time
+                """,
+                (start_date, end_date)
+            ).fetchall()
+    
+    @cached_read
+    def search_schedules(self, text, start_date, end_date, time_from=None, time_to=None,
+                         available_only=False):
+        """Find sessions between two dates, inclusive, matching every filter given.
+        
+        text is matched against class names through schedule_fts, each word
+        as a prefix. time_from and time_to bound the start time (HH:MM, to
+        exclusive); available_only keeps sessions with a free seat.
+        """
+        conditions = ["date BETWEEN ? AND ?"]
+        params = [start_date, end_date]
+        if time_from:
+            conditions.append("time >= ?")
+            params.append(time_from)
+        if time_to:
+            conditions.append("time < ?")
+            params.append(time_to)
+        if available_only:
+            conditions.append("booked_count < capacity")
+        match = fts_query(text)
+        if match:
+            # +id stops the planner from driving the query from the FTS
+            # matches, which would visit every matching session ever held
+            conditions.append("+id IN (SELECT rowid FROM schedule_fts WHERE schedule_fts MATCH ?)")
+            params.append(match)
+        with self.pool.connection() as conn:
+            return query(
+                conn, Schedule,
+                f"""
+                SELECT id, name, date, time, capacity, booked_count, duration
+                FROM schedule
+                WHERE {" AND ".join(conditions)}
+                ORDER BY date, time
+                """,
+                params
+            ).fetchall()
+    
+    def get_data_version(self, max_age=None):
+        """Return (version, updated_at) of the schedule data.
+        
+        Every insert, update or delete on the schedule table, including the
+        booked_count change made by a booking, bumps the version. With
+        max_age (seconds), a version read that recently is reused without
+        touching the database.
+        """
+        last = self._last_version
+        if max_age and last is not None and time.monotonic() - last[0] < max_age:
+            return last[1]
+        with self.pool.connection() as conn:
+            version = conn.execute(
+                "SELECT version, updated_at FROM data_version WHERE id = 1"
+            ).fetchone()
+        self._last_version = (time.monotonic(), version)
+        return version
+    
+    def get_seat_changes_since(self, change_id, limit=1000):
+        """Get (id, schedule_id, booked_count, capacity) seat changes after change_id.
+        
+        Deleted sessions have NULL counts. Passing change_id=None returns no
+        rows but still tells the caller where the log currently ends:
+        the result is (rows, last_change_id).
+        """
+        with self.pool.connection() as conn:
+            if change_id is None:
+                last = conn.execute("SELECT COALESCE(MAX(id), 0) FROM seat_changes").fetchone()[0]
+                return [], last
+            rows = query(
+                conn, SeatChange,
+                """
+                SELECT id, schedule_id, booked_count, capacity
+                FROM seat_changes
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+                """,
+                (change_id, limit)
+            ).fetchall()
+        return rows, (rows[-1].id if rows else change_id)
+    
+    def get_utilization(self, dimension, start_date, end_date):
+        """Summarize occupancy between two dates from the daily_stats table.
+        
+        dimension is 'day', 'class' or 'slot'. Returns (key, sessions,
+        capacity, booked) rows, where key is the date, class name or time.
+        """
+        group = "date" if dimension == "day" else "key"
+        with self.pool.connection() as conn:
+            return query(
+                conn, Utilization,
+                f"""
+                SELECT {group}, SUM(sessions), SUM(capacity), SUM(booked)
+                FROM daily_stats
+                WHERE date BETWEEN ? AND ? AND dimension = ?
+                GROUP BY {group}
+                ORDER BY {group}
+                """,
+                (start_date, end_date, dimension)
+            ).fetchall()
+    
+    def rebuild_daily_stats(self):
+        """Recompute daily_stats from the schedule table (backfill or repair).
+        
+        Days before the archive cutoff keep their stats, since their sessions
+        are no longer in the schedule table.
+        """
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                since = conn.execute(
+                    "SELECT COALESCE(archived_before, '') FROM archiving WHERE id = 1"
+                ).fetchone()[0]
+                for statement in migrations.REBUILD_LIVE_DAILY_STATS:
+                    conn.execute(statement, {"since": since})
+                conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False
+    
+    def reconcile_booked_counts(self, full=False, batch_size=500):
+        """Check schedule.booked_count against the bookings rows and fix drift.
+        
+        Only sessions touched since the last run are rechecked, unless full is
+        set or the change log no longer reaches back that far. Fixes are
+        written batch_size sessions at a time. Returns (mode, checked,
+        drifts) with drifts as CountDrift rows, or None on a database error.
+        """
+        try:
+            with self.pool.connection() as conn:
+                # One snapshot for the marks and the candidates read against them
+                conn.execute("BEGIN")
+                state = conn.execute(
+                    "SELECT last_booking_id, last_change_id, last_run_at FROM reconcile_state WHERE id = 1"
+                ).fetchone()
+                last_booking_id, last_change_id, last_run_at = state or (0, 0, None)
+                max_booking_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bookings").fetchone()[0]
+                first_change_id, max_change_id = conn.execute(
+                    "SELECT MIN(id), COALESCE(MAX(id), 0) FROM seat_changes"
+                ).fetchone()
+                pruned = first_change_id is not None and first_change_id > last_change_id + 1
+                mode = "full" if full or last_run_at is None or pruned else "incremental"
+                
+                if mode == "full":
+                    candidates = [row[0] for row in conn.execute(
+                        """
+                        SELECT s.id FROM schedule s
+                        LEFT JOIN bookings b ON b.schedule_id = s.id
+                        GROUP BY s.id
+                        HAVING s.booked_count IS NOT COUNT(b.id)
+                        """
+                    )]
+                    checked = conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+                else:
+                    candidates = [row[0] for row in conn.execute(
+                        """
+                        SELECT schedule_id FROM bookings WHERE id > ? AND id <= ?
+                        UNION
+                        SELECT schedule_id FROM seat_changes WHERE id > ? AND id <= ?
+                        """,
+                        (last_booking_id, max_booking_id, last_change_id, max_change_id)
+                    )]
+                    checked = len(candidates)
+                conn.rollback()
+                
+                drifts = []
+                for start in range(0, len(candidates), batch_size):
+                    batch = json.dumps(candidates[start:start + batch_size])
+                    conn.execute("BEGIN IMMEDIATE")
+                    found = query(
+                        conn, CountDrift,
+                        """
+                        SELECT s.id, s.name, s.date, s.time, s.capacity, s.booked_count, COUNT(b.id)
+                        FROM schedule s LEFT JOIN bookings b ON b.schedule_id = s.id
+                        WHERE s.id IN (SELECT value FROM json_each(?))
+                        GROUP BY s.id
+                        HAVING s.booked_count IS NOT COUNT(b.id)
+                        """,
+                        (batch,)
+                    ).fetchall()
+                    if found:
+                        conn.execute(
+                            """
+                            UPDATE schedule SET booked_count = counts.actual
+                            FROM (
+                                SELECT s.id, COUNT(b.id) AS actual
+                                FROM schedule s LEFT JOIN bookings b ON b.schedule_id = s.id
+                                WHERE s.id IN (SELECT value FROM json_each(?))
+                                GROUP BY s.id
+                            ) AS counts
+                            WHERE schedule.id = counts.id AND schedule.booked_count IS NOT counts.actual
+                            """,
+                            (json.dumps([drift.schedule_id for drift in found]),)
+                        )
+                        for drift in found:
+                            if drift.recorded is None or drift.actual < drift.recorded:
+                                self._promote_waitlist(conn, drift.schedule_id)
+                    conn.commit()
+                    drifts.extend(found)
+                
+                conn.execute(
+                    """
+                    UPDATE reconcile_state
+                    SET last_booking_id = ?, last_change_id = ?, last_mode = ?,
+                        last_run_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+                    WHERE id = 1
+                    """,
+                    (max_booking_id, max_change_id, mode)
+                )
+                conn.commit()
+            return mode, checked, drifts
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+    
+    def archive_sessions(self, before_date, batch_size=500, vacuum_pages=1000):
+        """Move sessions dated before before_date, with their bookings, to the archive.
+        
+        Each batch of batch_size sessions is copied to the archive in one
+        transaction and deleted here in a second one, since SQLite commits the
+        two WAL files separately; a crash in between leaves the batch in both
+        places and the next run copies it again. Sessions changed between the
+        two steps are left for the next batch. Returns (sessions, bookings) moved.
+        """
+        moved_sessions = moved_bookings = 0
+        while True:
+            try:
+                with self.pool.connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    ids = [row[0] for row in conn.execute(
+                        "SELECT id FROM schedule WHERE date < ? ORDER BY date, time, id LIMIT ?",
+                        (before_date, batch_size)
+                    )]
+                    if not ids:
+                        conn.rollback()
+                        break
+                    conn.execute(
+                        """
+                        INSERT OR REPLACE INTO archive.schedule
+                            (id, name, date, time, capacity, booked_count, duration, rule_id)
+                        SELECT id, name, date, time, capacity, booked_count, duration, rule_id
+                        FROM main.schedule WHERE id IN (SELECT value FROM json_each(?))
+                        """,
+                        (json.dumps(ids),)
+                    )
+                    conn.execute(
+                        """
+                        INSERT OR REPLACE INTO archive.bookings
+                            (id, schedule_id, customer_name, customer_email, booking_time)
+                        SELECT id, schedule_id, customer_name, customer_email, booking_time
+                        FROM main.bookings WHERE schedule_id IN (SELECT value FROM json_each(?))
+                        """,
+                        (json.dumps(ids),)
+                    )
+                    conn.commit()
+                    
+                    conn.execute("BEGIN IMMEDIATE")
+                    # Only sessions whose archive copy is still current
+                    batch = json.dumps([row[0] for row in conn.execute(
+                        """
+                        SELECT s.id FROM main.schedule s JOIN archive.schedule a ON a.id = s.id
+                        WHERE s.id IN (SELECT value FROM json_each(?))
+                          AND a.name IS s.name AND a.date IS s.date AND a.time IS s.time
+                          AND a.capacity IS s.capacity AND a.booked_count IS s.booked_count
+                          AND a.duration IS s.duration AND a.rule_id IS s.rule_id
+                          AND NOT EXISTS (
+                              SELECT 1 FROM main.bookings b
+                              WHERE b.schedule_id = s.id
+                                AND NOT EXISTS (SELECT 1 FROM archive.bookings c WHERE c.id = b.id)
+                          )
+                        """,
+                        (json.dumps(ids),)
+                    )])
+                    # Tells the delete triggers these sessions are archived, not cancelled
+                    conn.execute(
+                        """
+                        UPDATE archiving
+                        SET active = 1, archived_before = MAX(COALESCE(archived_before, ''), ?)
+                        WHERE id = 1
+                        """,
+                        (before_date,)
+                    )
+                    # Sessions go first so bookings_after_delete has no count to update
+                    sessions = conn.execute(
+                        "DELETE FROM main.schedule WHERE id IN (SELECT value FROM json_each(?))",
+                        (batch,)
+                    ).rowcount
+                    cursor = conn.execute(
+                        "DELETE FROM main.bookings WHERE schedule_id IN (SELECT value FROM json_each(?))",
+                        (batch,)
+                    )
+                    conn.execute(
+                        "DELETE FROM main.waitlist WHERE schedule_id IN (SELECT value FROM json_each(?))",
+                        (batch,)
+                    )
+                    conn.execute("UPDATE archiving SET active = 0 WHERE id = 1")
+                    conn.commit()
+                    moved_sessions += sessions
+                    moved_bookings += cursor.rowcount
+                    if not sessions:
+                        # Every session changed under us; leave them for another run
+                        break
+                    
+                    # Outside the transaction: hand the freed pages back to the OS.
+                    # executescript steps the pragma to completion; execute would
+                    # stop after the first page.
+                    conn.executescript(f"PRAGMA main.incremental_vacuum({max(int(vacuum_pages), 1)})")
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                break
+        return moved_sessions, moved_bookings
+    
+    def enable_incremental_vacuum(self):
+        """Switch an existing database file to incremental auto-vacuum.
+        
+        Files created by this version already use it. Older files need one
+        full VACUUM to convert, which rewrites the whole database, so this is
+        left to an explicit maintenance run. Returns True if a conversion ran.
+        """
+        with self.pool.connection() as conn:
+            if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] == 2:
+                return False
+            conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM main")
+        return True
+    
+    def get_archived_schedules_page(self, after=None, limit=50, date_from=None, date_to=None):
+        """Get one page of archived sessions, most recent first.
+        
+        Keyset pagination as in get_schedules_page, walking (date, time, id)
+        backwards. Returns (rows, next_after) where rows are (id, name, date,
+        time, capacity, booked_count, duration).
+        """
+        conditions = []
+        params = []
+        if after is not None:
+            conditions.append("(date, time, id) < (?, ?, ?)")
+            params.extend(after)
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.pool.connection() as conn:
+            rows = query(
+                conn, Schedule,
+                f"""
+                SELECT id, name, date, time, capacity, booked_count, duration
+                FROM archive.schedule
+                {where}
+                ORDER BY date DESC, time DESC, id DESC
+                LIMIT ?
+                """,
+                params + [limit + 1]
+            ).fetchall()
+        
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            return rows, (last.date, last.time, last.id)
+        return rows, None
+    
+    def get_archived_schedule_by_id(self, schedule_id):
+        """Get one archived session."""
+        with self.pool.connection() as conn:
+            return query(
+                conn, Schedule,
+                """
+                SELECT id, name, date, time, capacity, booked_count, duration
+                FROM archive.schedule WHERE id = ?
+                """,
+                (schedule_id,)
+            ).fetchone()
+    
+    def get_archived_bookings(self, schedule_id):
+        """Get the bookings of an archived session, newest first."""
+        with self.pool.connection() as conn:
+            return query(
+                conn, Booking,
+                """
+                SELECT id, customer_name, customer_email, booking_time
+                FROM archive.bookings
+                WHERE schedule_id = ?
+                ORDER BY booking_time DESC, id DESC
+                """,
+                (schedule_id,)
+            ).fetchall()
+    
+    def get_customer_bookings(self, customer_email, past_limit=50):
+        """Get a customer's bookings as (upcoming, past).
+        
+        Both lists are found through the customer_email indexes of the live
+        and archive bookings tables. Upcoming sessions (today onwards) come
+        soonest first; past ones, archived included, most recent first and
+        capped at past_limit.
+        """
+        customer_email = normalize_email(customer_email)
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self.pool.connection() as conn:
+            upcoming = query(
+                conn, CustomerBooking, migrations.CUSTOMER_UPCOMING_SQL, (customer_email, today)
+            ).fetchall()
+            past = query(
+                conn, CustomerBooking, migrations.CUSTOMER_PAST_SQL,
+                (customer_email, today, customer_email, past_limit)
+            ).fetchall()
+        return upcoming, past
     
     def verify_admin(self, username, password):
         """Verify admin credentials."""
-        self.cursor.execute(
-            "SELECT id FROM admin WHERE username = ? AND password = ?",
-            (username, password)
-        )
-        result = self.cursor.fetchone()
+        with self.pool.connection() as conn:
+            result = conn.execute(
+                "SELECT id FROM admin WHERE username = ? AND password = ?",
+                (username, password)
+            ).fetchone()
         return result is not None
     
+    def add_recurrence_rule(self, name, weekdays, time, capacity, start_date, end_date=None,
+                            duration=DEFAULT_DURATION):
+        """Add a recurring class rule.
+        
+        weekdays is an iterable of weekday numbers (Monday = 0). end_date is
+        inclusive; None keeps the rule running until it is deleted. Returns
+        the new rule id, or None if a date or the time is malformed or on error.
+        """
+        if not all(valid_slot(date, time, duration) for date in (start_date, end_date or start_date)):
+            return None
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.execute(
+                    """
+                    INSERT INTO recurrence_rules
+                        (name, weekdays, time, capacity, start_date, end_date, duration)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (name, ",".join(str(day) for day in sorted(set(weekdays))), time,
+                     capacity, start_date, end_date, duration)
+                )
+                conn.commit()
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+    
+    def get_recurrence_rules(self):
+        """Get all recurring class rules."""
+        with self.pool.connection() as conn:
+            return query(
+                conn, RecurrenceRule,
+                """
+                SELECT id, name, weekdays, time, capacity, start_date, end_date, duration
+                FROM recurrence_rules
+                ORDER BY name, time
+                """
+            ).fetchall()
+    
+    def delete_recurrence_rule(self, rule_id):
+        """Delete a rule and its upcoming sessions that nobody has booked yet."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        try:
+            with self.pool.connection() as conn:
+                conn.execute(
+                    "DELETE FROM schedule WHERE rule_id = ? AND date >= ? AND booked_count = 0",
+                    (rule_id, today)
+                )
+                conn.execute("DELETE FROM recurrence_rules WHERE id = ?", (rule_id,))
+                conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False
+    
+    def expand_recurrence_rules(self, horizon_days=28, rule_id=None):
+        """Create the sessions of every rule (or one rule) up to horizon_days ahead.
+        
+        Each rule only expands dates after its expanded_through mark, which
+        then moves up to the horizon, so sessions an admin deleted are not
+        created again. The new sessions are checked for overlaps in one
+        sweep, as in add_schedules, and go in with a single executemany.
+        Returns (created, skipped) where skipped lists (name, date, time,
+        clashing name, clashing time) for each session left out because it
+        would overlap another; those dates are not tried again.
+        """
+        today = datetime.now().date()
+        horizon = today + timedelta(days=horizon_days)
+        rules = self.get_recurrence_rules()
+        if rule_id is not None:
+            rules = [rule for rule in rules if rule.id == rule_id]
+        if not rules:
+            return 0, []
+        
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                expanded_through = dict(conn.execute(
+                    "SELECT id, expanded_through FROM recurrence_rules WHERE expanded_through IS NOT NULL"
+                ))
+                rows = []
+                marks = []
+                for rule in rules:
+                    days = set(rule.days)
+                    current = max(today, datetime.strptime(rule.start_date, "%Y-%m-%d").date())
+                    if rule.id in expanded_through:
+                        mark = datetime.strptime(expanded_through[rule.id], "%Y-%m-%d").date()
+                        current = max(current, mark + timedelta(days=1))
+                    last = horizon
+                    if rule.end_date:
+                        last = min(last, datetime.strptime(rule.end_date, "%Y-%m-%d").date())
+                    if current > last:
+                        continue
+                    while current <= last:
+                        if current.weekday() in days:
+                            rows.append((rule.name, current.strftime("%Y-%m-%d"), rule.time,
+                                         rule.capacity, rule.duration, rule.id))
+                        current += timedelta(days=1)
+                    marks.append((last.strftime("%Y-%m-%d"), rule.id))
+                
+                conflicts = self._find_overlaps(conn, [row[:3] + row[4:5] for row in rows])
+                rejected = {index for index, *_ in conflicts}
+                cursor = conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO schedule (name, date, time, capacity, duration, rule_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    [row for index, row in enumerate(rows) if index not in rejected]
+                )
+                conn.executemany(
+                    "UPDATE recurrence_rules SET expanded_through = ? WHERE id = ?", marks
+                )
+                conn.commit()
+            skipped = [rows[index][:3] + (other, time) for index, other, _, time, _ in conflicts]
+            return max(cursor.rowcount, 0), skipped
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return 0, []
+    
     def initialize_sample_data(self):
         """Initialize with sample schedule data."""
         # Check if we already have data
-        self.cursor.execute("SELECT COUNT(*) FROM schedule")
-        if self.cursor.fetchone()[0] > 0:
-            return
+        with self.pool.connection() as conn:
+            if conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0] > 0:
+                return
         
         # Add sample classes for the next 7 days
         class_names = [
@@ -211,25 +1426,21 @@ class GymDatabase:
             "Evening Pilates", "Boxing Basics", "Dance Fitness"
         ]
         
+        rows = []
         today = datetime.now()
         for day in range(7):
             current_date = (today + timedelta(days=day)).strftime("%Y-%m-%d")
             
-            # Morning class
-            morning_time = "07:00"
-            self.add_schedule(class_names[day % len(class_names)], current_date, morning_time, 15)
-            
-            # Afternoon class
-            afternoon_time = "12:30"
-            self.add_schedule(class_names[(day + 1) % len(class_names)], current_date, afternoon_time, 20)
-            
-            # Evening class
-            evening_time = "18:00"
-            self.add_schedule(class_names[(day + 2) % len(class_names)], current_date, evening_time, 25)
+            # Morning, afternoon and evening classes
+            rows.append((class_names[day % len(class_names)], current_date, "07:00", 15))
+            rows.append((class_names[(day + 1) % len(class_names)], current_date, "12:30", 20))
+            rows.append((class_names[(day + 2) % len(class_names)], current_date, "18:00", 25))
+        
+        self.add_schedules(rows)
     
     def close(self):
-        """Close the database connection."""
-        self.conn.close()
+        """Close the pooled database connections."""
+        self.pool.close()
 
 # Create and initialize the database if running this file directly
 if __name__ == "__main__":
@@ -247,6 +1458,7 @@ if __name__ == "__main__":
     print("ID | Name | Date | Time | Capacity | Booked")
     print("-" * 60)
     for schedule in schedules:
-        print(f"{schedule[0]} | {schedule[1]} | {schedule[2]} | {schedule[3]} | {schedule[4]} | {schedule[5]}")
+        print(f"{schedule.id} | {schedule.name} | {schedule.date} | {schedule.time} | "
+              f"{schedule.capacity} | {schedule.booked_count}")
     
     db.close()
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""HTTP conditional caching and compression helpers for the Flask apps.
+
+ETags are derived from the schedule data version (plus whatever else makes
+a representation unique), so a request can be answered with 304 before any
+schedule query runs.
+"""
+import gzip
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 1024
+
+
+def make_etag(version, *parts):
+    """Build a strong ETag value from the data version and other key parts."""
+    digest = hashlib.blake2s(repr(parts).encode(), digest_size=8).hexdigest()
+    return f"v{version}-{digest}"
+
+
+def parse_timestamp(value):
+    """Parse data_version.updated_at into an aware UTC datetime (whole seconds)."""
+    parsed = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+    return parsed.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def wants_gzip():
+    return "gzip" in request.accept_encodings
+
+
+def not_modified(etag, last_modified, cache_control="no-cache"):
+    """Return a 304 response if the client's copy is current, otherwise None."""
+    if request.if_none_match:
+        # Small bodies are sent uncompressed, so either variant may be cached
+        for candidate in (f"{etag}-gzip", etag):
+            if request.if_none_match.contains(candidate):
+                etag = candidate
+                break
+        else:
+            return None
+        fresh = True
+    else:
+        since = request.if_modified_since
+        fresh = since is not None and last_modified <= since
+    if not fresh:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def cached_response(body, mimetype, etag, last_modified, cache_control="no-cache"):
+    """Build a 200 response with validators, gzip-compressed when worthwhile."""
+    data = body.encode("utf-8") if isinstance(body, str) else body
+    response = Response(mimetype=mimetype)
+    if wants_gzip() and len(data) >= GZIP_MIN_SIZE:
+        data = gzip.compress(data, compresslevel=6)
+        response.headers["Content-Encoding"] = "gzip"
+        etag = f"{etag}-gzip"
+    response.set_data(data)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
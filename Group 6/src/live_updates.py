@@ -0,0 +1,112 @@
+"""Server-Sent Events feed of seat-count changes.
+
+A single SeatFeed per process tails the seat_changes table (filled by
+triggers on schedule, so changes made by the admin process show up too)
+and fans each batch of deltas out to every subscribed SSE connection.
+Adding subscribers adds no database work.
+"""
+import json
+import queue
+import threading
+
+
+def format_change(change):
+    """Turn a seat_changes row into the delta sent to browsers."""
+    if change.booked_count is None:
+        return {"id": change.schedule_id, "deleted": True}
+    return {"id": change.schedule_id, "booked": change.booked_count, "capacity": change.capacity}
+
+
+def coalesce(changes):
+    """Keep only the latest change per session, in change order."""
+    latest = {}
+    for change in changes:
+        latest.pop(change.schedule_id, None)
+        latest[change.schedule_id] = change
+    return list(latest.values())
+
+
+class SeatFeed:
+    def __init__(self, db, poll_interval=0.5, max_backlog=100):
+        """poll_interval is in seconds; a subscriber that falls more than
+        max_backlog batches behind is disconnected (the browser reconnects)."""
+        self.db = db
+        self.poll_interval = poll_interval
+        self.max_backlog = max_backlog
+        self.last_change_id = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self):
+        """Register a new listener and return its queue of change batches."""
+        listener = queue.Queue(maxsize=self.max_backlog)
+        with self._lock:
+            self._subscribers.add(listener)
+            # Started lazily so a forking server starts it in the worker
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="seat-feed", daemon=True)
+                self._thread.start()
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            self._subscribers.discard(listener)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        _, self.last_change_id = self.db.get_seat_changes_since(None)
+        while not self._stop.wait(self.poll_interval):
+            try:
+                changes, self.last_change_id = self.db.get_seat_changes_since(self.last_change_id)
+            except Exception as e:
+                print(f"Seat feed error: {e}")
+                continue
+            if changes:
+                self.publish(changes)
+
+    def publish(self, changes):
+        """Send one batch of seat_changes rows to every subscriber."""
+        batch = (changes[-1].id, [format_change(change) for change in coalesce(changes)])
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for listener in subscribers:
+            try:
+                listener.put_nowait(batch)
+            except queue.Full:
+                # Too slow to keep up: drop it and let the client reconnect
+                self.unsubscribe(listener)
+                while True:
+                    try:
+                        listener.get_nowait()
+                    except queue.Empty:
+                        break
+                listener.put_nowait(None)
+
+    def stream(self, last_event_id=None, keepalive=15):
+        """Yield SSE-formatted text for one client until it disconnects."""
+        listener = self.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            if last_event_id is not None:
+                # Replay what a reconnecting client missed, if still in the log
+                missed, last = self.db.get_seat_changes_since(last_event_id)
+                if missed:
+                    deltas = [format_change(change) for change in coalesce(missed)]
+                    yield f"id: {last}\ndata: {json.dumps(deltas)}\n\n"
+            while True:
+                try:
+                    batch = listener.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if batch is None:
+                    return
+                change_id, deltas = batch
+                yield f"id: {change_id}\ndata: {json.dumps(deltas)}\n\n"
+        finally:
+            self.unsubscribe(listener)
@@ -0,0 +1,104 @@
+"""Maintenance commands for the gym database.
+
+Usage: python manage.py [--db gym_schedule.db] <command>
+
+Commands:
+    rebuild-stats   recompute the daily_stats summary from the schedule table
+    import-schedule add sessions from a CSV file, skipping any that overlap
+    archive         move old sessions and their bookings to the archive database
+    reconcile       fix booked_count where it differs from the bookings table
+"""
+import argparse
+import csv
+import os
+from datetime import datetime, timedelta
+
+from gym_database import GymDatabase
+
+
+def rebuild_stats(db, args):
+    if not db.rebuild_daily_stats():
+        return 1
+    print("daily_stats rebuilt.")
+    return 0
+
+
+def import_schedule(db, args):
+    # Columns: name, date, time, capacity and optionally duration in minutes
+    with open(args.csv_file, newline="") as f:
+        rows = [
+            (row["name"], row["date"], row["time"], int(row["capacity"]),
+             *([int(row["duration"])] if row.get("duration") else []))
+            for row in csv.DictReader(f)
+        ]
+    added, conflicts, invalid = db.add_schedules(rows)
+    for index in invalid:
+        row = rows[index]
+        print(f"skipped line {index + 2}: {row[0]} {row[1]} {row[2]} is not a valid date and time")
+    for index, name, date, time, end_time in conflicts:
+        row = rows[index]
+        print(f"skipped line {index + 2}: {row[0]} {row[1]} {row[2]} overlaps {name} ({time}-{end_time})")
+    print(f"{added} of {len(rows)} sessions imported.")
+    return 1 if conflicts or invalid else 0
+
+
+def archive(db, args):
+    before = args.before or (datetime.now() - timedelta(days=args.days)).strftime("%Y-%m-%d")
+    if args.enable_incremental_vacuum and db.enable_incremental_vacuum():
+        print("Switched the database to incremental auto-vacuum.")
+    sessions, bookings = db.archive_sessions(before, batch_size=args.batch_size)
+    print(f"Archived {sessions} sessions and {bookings} bookings dated before {before} "
+          f"to {db.archive_db}.")
+    return 0
+
+
+def reconcile(db, args):
+    result = db.reconcile_booked_counts(full=args.full, batch_size=args.batch_size)
+    if result is None:
+        return 1
+    mode, checked, drifts = result
+    for drift in drifts:
+        note = " (overbooked)" if drift.overbooked else ""
+        print(f"session {drift.schedule_id} {drift.name} {drift.date} {drift.time}: "
+              f"booked_count {drift.recorded} -> {drift.actual} of {drift.capacity}{note}")
+    print(f"{mode} check: {checked} sessions checked, {len(drifts)} counts fixed.")
+    return 0
+
+
+COMMANDS = {
+    "rebuild-stats": rebuild_stats,
+    "import-schedule": import_schedule,
+    "archive": archive,
+    "reconcile": reconcile,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands for the gym database.")
+    parser.add_argument("--db", default=os.environ.get("GYM_DB", "gym_schedule.db"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild-stats", help="recompute the daily_stats summary table")
+    importer = subparsers.add_parser("import-schedule", help="add sessions from a CSV file")
+    importer.add_argument("csv_file", help="CSV with name,date,time,capacity[,duration] columns")
+    archiver = subparsers.add_parser("archive", help="move old sessions to the archive database")
+    archiver.add_argument("--days", type=int, default=90,
+                          help="archive sessions more than this many days old (default 90)")
+    archiver.add_argument("--before", help="archive sessions dated before YYYY-MM-DD instead")
+    archiver.add_argument("--batch-size", type=int, default=500)
+    archiver.add_argument("--enable-incremental-vacuum", action="store_true",
+                          help="convert an older database file first (one full VACUUM)")
+    reconciler = subparsers.add_parser("reconcile", help="fix drifted booked_count values")
+    reconciler.add_argument("--full", action="store_true",
+                            help="check every session instead of those changed since the last run")
+    reconciler.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    db = GymDatabase(args.db)
+    try:
+        return COMMANDS[args.command](db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
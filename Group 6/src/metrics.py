@@ -0,0 +1,213 @@
+"""Request and query instrumentation with a Prometheus text endpoint.
+
+instrument_database(db) wraps every public GymDatabase method to record its
+latency, the number of rows it returned and any SQLite errors (busy/locked
+errors are counted separately); a call one method makes to another counts
+towards the outer one only. init_app(app, name) adds per-route request
+timing to a Flask app and serves everything at /metrics.
+
+Set GYM_SLOW_QUERY_MS to log database calls slower than that many
+milliseconds to the "gym.slow_query" logger.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, g, request
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+slow_query_log = logging.getLogger("gym.slow_query")
+
+# Name of the GymDatabase method running in this thread/context
+_current_method = contextvars.ContextVar("current_method", default="unknown")
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Registry:
+    """Process-wide metric storage, keyed by label tuples."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.query_seconds = {}
+        self.query_rows = {}
+        self.query_errors = {}
+        self.request_seconds = {}
+        self.slow_query_threshold = None
+        threshold = os.environ.get("GYM_SLOW_QUERY_MS")
+        if threshold:
+            self.slow_query_threshold = float(threshold) / 1000
+        self.databases = []
+
+    def observe_query(self, method, seconds, rows):
+        with self.lock:
+            self.query_seconds.setdefault(method, Histogram()).observe(seconds)
+            if rows is not None:
+                self.query_rows[method] = self.query_rows.get(method, 0) + rows
+        if self.slow_query_threshold is not None and seconds >= self.slow_query_threshold:
+            slow_query_log.warning("slow query: %s took %.1f ms", method, seconds * 1000)
+
+    def record_error(self, error):
+        message = str(error).lower()
+        if isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message):
+            kind = "busy"
+        else:
+            kind = type(error).__name__
+        key = (_current_method.get(), kind)
+        with self.lock:
+            self.query_errors[key] = self.query_errors.get(key, 0) + 1
+
+    def observe_request(self, app_name, route, method, status, seconds):
+        with self.lock:
+            key = (app_name, route, method, str(status))
+            self.request_seconds.setdefault(key, Histogram()).observe(seconds)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            render_histograms(lines, "gym_db_query_seconds", "Latency of GymDatabase calls.",
+                              ("method",), self.query_seconds)
+            lines.append("# HELP gym_db_rows_total Rows returned by GymDatabase calls.")
+            lines.append("# TYPE gym_db_rows_total counter")
+            for method, rows in sorted(self.query_rows.items()):
+                lines.append(f"gym_db_rows_total{labels(method=method)} {rows}")
+            lines.append("# HELP gym_db_errors_total SQLite errors by method and kind (busy = lock waits that timed out).")
+            lines.append("# TYPE gym_db_errors_total counter")
+            for (method, kind), count in sorted(self.query_errors.items()):
+                lines.append(f"gym_db_errors_total{labels(method=method, kind=kind)} {count}")
+            render_histograms(lines, "gym_http_request_seconds", "Latency of HTTP requests by route.",
+                              ("app", "route", "method", "status"), self.request_seconds)
+            caches = [db.cache for db in self.databases if db.cache is not None]
+            if caches:
+                lines.append("# HELP gym_query_cache_hits_total Query cache hits.")
+                lines.append("# TYPE gym_query_cache_hits_total counter")
+                lines.append(f"gym_query_cache_hits_total {sum(c.hits for c in caches)}")
+                lines.append("# HELP gym_query_cache_misses_total Query cache misses.")
+                lines.append("# TYPE gym_query_cache_misses_total counter")
+                lines.append(f"gym_query_cache_misses_total {sum(c.misses for c in caches)}")
+        return "\n".join(lines) + "\n"
+
+
+def labels(**values):
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in values.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_histograms(lines, name, help_text, label_names, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(histograms.items()):
+        key = key if isinstance(key, tuple) else (key,)
+        base = dict(zip(label_names, key))
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{labels(**base, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{labels(**base, le='+Inf')} {histogram.count}")
+        lines.append(f"{name}_sum{labels(**base)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{labels(**base)} {histogram.count}")
+
+
+REGISTRY = Registry()
+
+
+def count_rows(result):
+    """Rows in a GymDatabase result: lists and (rows, cursor) pages count, rows are 1."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if isinstance(result, tuple) and result and not isinstance(result[0], bool):
+        return 1
+    if result is None:
+        return 0
+    return None
+
+
+def _wrap(name, method, registry):
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            if _current_method.get() != "unknown":
+                # Called from another instrumented method, which records it
+                yield from method(*args, **kwargs)
+                return
+            token = _current_method.set(name)
+            start = time.perf_counter()
+            rows = 0
+            try:
+                for row in method(*args, **kwargs):
+                    rows += 1
+                    yield row
+            finally:
+                registry.observe_query(name, time.perf_counter() - start, rows)
+                _current_method.reset(token)
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _current_method.get() != "unknown":
+            return method(*args, **kwargs)
+        token = _current_method.set(name)
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            _current_method.reset(token)
+        registry.observe_query(name, time.perf_counter() - start, count_rows(result))
+        return result
+    return wrapper
+
+
+def instrument_database(db, registry=REGISTRY):
+    """Wrap every public method of a GymDatabase instance with timing."""
+    for name, _ in inspect.getmembers(type(db), inspect.isfunction):
+        if not name.startswith("_"):
+            setattr(db, name, _wrap(name, getattr(db, name), registry))
+    # The pool sees SQLite errors before the methods catch and print them
+    db.pool.on_error = registry.record_error
+    registry.databases.append(db)
+    return db
+
+
+def init_app(app, app_name, registry=REGISTRY):
+    """Time every request by route and serve the registry at /metrics."""
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            registry.observe_request(app_name, route, request.method, response.status_code,
+                                     time.perf_counter() - started)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,689 @@
+"""Versioned schema migrations for the gym database.
+
+The schema version is kept in SQLite's ``PRAGMA user_version``. Tables from
+the original release are created by ``GymDatabase.create_tables`` (version 0);
+every later change is appended to ``MIGRATIONS`` and applied exactly once,
+in order, inside its own transaction.
+
+Run this file directly to upgrade an existing database in place and print
+the query plans of the hot queries:
+
+    python migrations.py [path/to/gym_schedule.db]
+"""
+import sqlite3
+import sys
+
+# daily_stats keeps one row per date for each dimension: the whole day, each
+# class name and each time slot, so dashboard panels never touch schedule
+STATS_DIMENSIONS = (("day", "''"), ("class", "{row}.name"), ("slot", "{row}.time"))
+
+REBUILD_DAILY_STATS = ["DELETE FROM daily_stats"] + [
+    f"""
+    INSERT INTO daily_stats (date, dimension, key, sessions, capacity, booked)
+    SELECT date, '{dimension}', {key.format(row="schedule")},
+           COUNT(*), SUM(capacity), SUM(booked_count)
+    FROM schedule
+    GROUP BY date, {key.format(row="schedule")}
+    """
+    for dimension, key in STATS_DIMENSIONS
+]
+
+
+# End of a session as HH:MM, computed from its start time and duration
+SLOT_END_SQL = (
+    "printf('%02d:%02d', "
+    "(substr(time, 1, 2) * 60 + substr(time, 4, 2) + duration) / 60, "
+    "(substr(time, 1, 2) * 60 + substr(time, 4, 2) + duration) % 60)"
+)
+
+
+def _stats_delta(row, sign):
+    """SQL adding (sign='') or removing (sign='-') one schedule row's stats."""
+    return "\n".join(
+        f"""
+        INSERT INTO daily_stats (date, dimension, key, sessions, capacity, booked)
+        VALUES ({row}.date, '{dimension}', {key.format(row=row)},
+                {sign}1, {sign}{row}.capacity, {sign}{row}.booked_count)
+        ON CONFLICT (date, dimension, key) DO UPDATE SET
+            sessions = sessions + excluded.sessions,
+            capacity = capacity + excluded.capacity,
+            booked = booked + excluded.booked;
+        """
+        for dimension, key in STATS_DIMENSIONS
+    )
+
+# Rebuild for the dates still held in the schedule table; days before the
+# archive cutoff are left alone because their sessions have moved out
+REBUILD_LIVE_DAILY_STATS = [
+    "DELETE FROM daily_stats WHERE date >= :since"
+] + [
+    f"""
+    INSERT INTO daily_stats (date, dimension, key, sessions, capacity, booked)
+    SELECT date, '{dimension}', {key.format(row="schedule")},
+           COUNT(*), SUM(capacity), SUM(booked_count)
+    FROM schedule
+    WHERE date >= :since
+    GROUP BY date, {key.format(row="schedule")}
+    """
+    for dimension, key in STATS_DIMENSIONS
+]
+
+# Tables of the archive database, attached to every connection as "archive".
+# Rows keep their original ids, so re-copying a batch simply replaces it.
+ARCHIVE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.schedule (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        capacity INTEGER,
+        booked_count INTEGER,
+        duration INTEGER,
+        rule_id INTEGER,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_schedule_date_time ON schedule (date, time, id)",
+    """
+    CREATE TABLE IF NOT EXISTS archive.bookings (
+        id INTEGER PRIMARY KEY,
+        schedule_id INTEGER NOT NULL,
+        customer_name TEXT NOT NULL,
+        customer_email TEXT NOT NULL,
+        booking_time TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_bookings_schedule ON bookings (schedule_id, booking_time)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_bookings_customer ON bookings (customer_email, schedule_id)",
+]
+
+
+def promote_waitlist(conn, schedule_id):
+    """Move people from the front of a session's waitlist into free seats.
+
+    Must run inside the caller's write transaction. Each step reads the
+    head through idx_waitlist_schedule and books it with the same
+    conditional insert as book_session, stopping once the session is full
+    or nobody is waiting. Waiters who already hold a booking for the
+    session are dropped from the queue. Shared by GymDatabase and the
+    duplicate-booking migration. Returns the emails promoted.
+    """
+    promoted = []
+    while True:
+        head = conn.execute(
+            """
+            SELECT id, customer_name, customer_email FROM waitlist
+            WHERE schedule_id = ? ORDER BY id LIMIT 1
+            """,
+            (schedule_id,)
+        ).fetchone()
+        if head is None:
+            break
+        try:
+            cursor = conn.execute(
+                """
+                INSERT INTO bookings (schedule_id, customer_name, customer_email)
+                SELECT id, ?, ? FROM schedule
+                WHERE id = ? AND booked_count < capacity
+                """,
+                (head[1], head[2], schedule_id)
+            )
+        except sqlite3.IntegrityError:
+            # Only the failed statement is undone; the transaction goes on
+            conn.execute("DELETE FROM waitlist WHERE id = ?", (head[0],))
+            continue
+        if cursor.rowcount == 0:
+            break
+        conn.execute("DELETE FROM waitlist WHERE id = ?", (head[0],))
+        promoted.append(head[2])
+    return promoted
+
+
+def _remove_duplicate_bookings(conn):
+    """Move extra bookings of one email for one session into duplicate_bookings.
+
+    Emails are compared trimmed and lower-cased, the form GymDatabase
+    stores them in. The earliest booking of each (email, session) is kept.
+    Deleting the others frees their seats through bookings_after_delete, and
+    the freed seats go to the session's waitlist through promote_waitlist.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS duplicate_bookings (
+            id INTEGER PRIMARY KEY,
+            schedule_id INTEGER NOT NULL,
+            customer_name TEXT NOT NULL,
+            customer_email TEXT NOT NULL,
+            booking_time TIMESTAMP,
+            removed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO duplicate_bookings (id, schedule_id, customer_name, customer_email, booking_time)
+        SELECT id, schedule_id, customer_name, customer_email, booking_time
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY lower(trim(customer_email)), schedule_id ORDER BY id
+            ) AS copy
+            FROM bookings
+        )
+        WHERE copy > 1
+        """
+    )
+    removed = conn.execute("DELETE FROM bookings WHERE id IN (SELECT id FROM duplicate_bookings)").rowcount
+    # Nobody waits for a session they already hold a seat in
+    conn.execute(
+        """
+        DELETE FROM waitlist WHERE EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.schedule_id = waitlist.schedule_id
+              AND lower(trim(b.customer_email)) = lower(trim(waitlist.customer_email))
+        )
+        """
+    )
+    if not removed:
+        return
+    sessions = [row[0] for row in conn.execute("SELECT DISTINCT schedule_id FROM duplicate_bookings")]
+    promoted = sum(len(promote_waitlist(conn, schedule_id)) for schedule_id in sessions)
+    print(f"Removed {removed} duplicate bookings from {len(sessions)} sessions "
+          f"(kept in duplicate_bookings); {promoted} waitlisted customers got the freed seats.")
+
+
+def _normalize_archived_emails(conn):
+    """Trim and lower-case the emails of archived bookings, if there are any yet."""
+    if conn.execute(
+        "SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = 'bookings'"
+    ).fetchone():
+        conn.execute(
+            """
+            UPDATE archive.bookings SET customer_email = lower(trim(customer_email))
+            WHERE customer_email <> lower(trim(customer_email))
+            """
+        )
+
+
+# (version, description, steps). A step is either an SQL string or a
+# callable taking the connection, for migrations that need Python logic.
+MIGRATIONS = [
+    (1, "Covering index for date-ordered schedule listings", [
+        """
+        CREATE INDEX IF NOT EXISTS idx_schedule_date_time
+        ON schedule (date, time, name, capacity, booked_count)
+        """,
+    ]),
+    (2, "Index bookings by session and booking time", [
+        """
+        CREATE INDEX IF NOT EXISTS idx_bookings_schedule_time
+        ON bookings (schedule_id, booking_time)
+        """,
+    ]),
+    (3, "Data version counter bumped by every schedule change", [
+        """
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        """
+        INSERT OR IGNORE INTO data_version (id, version, updated_at)
+        VALUES (1, 0, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        """,
+        # Bookings change booked_count, so the schedule triggers cover them too
+        *[
+            f"""
+            CREATE TRIGGER IF NOT EXISTS schedule_version_{event.lower()}
+            AFTER {event} ON schedule
+            BEGIN
+                UPDATE data_version
+                SET version = version + 1,
+                    updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+                WHERE id = 1;
+            END
+            """
+            for event in ("INSERT", "UPDATE", "DELETE")
+        ],
+    ]),
+    (4, "Add id to the schedule index for keyset pagination", [
+        # Ending the key with id lets ORDER BY date, time, id and the
+        # (date, time, id) > (?, ?, ?) seek be answered straight from the index
+        "DROP INDEX IF EXISTS idx_schedule_date_time",
+        """
+        CREATE INDEX idx_schedule_date_time
+        ON schedule (date, time, id, name, capacity, booked_count)
+        """,
+    ]),
+    (5, "Recurring class rules and the sessions expanded from them", [
+        """
+        CREATE TABLE IF NOT EXISTS recurrence_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            weekdays TEXT NOT NULL,
+            time TEXT NOT NULL,
+            capacity INTEGER DEFAULT 20,
+            start_date TEXT NOT NULL,
+            end_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "ALTER TABLE schedule ADD COLUMN rule_id INTEGER REFERENCES recurrence_rules (id)",
+        # One session per rule and date, so re-expanding never duplicates
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_rule_date
+        ON schedule (rule_id, date) WHERE rule_id IS NOT NULL
+        """,
+    ]),
+    (6, "Change log of seat counts for live updates", [
+        """
+        CREATE TABLE IF NOT EXISTS seat_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_id INTEGER NOT NULL,
+            booked_count INTEGER,
+            capacity INTEGER,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS schedule_seats_update
+        AFTER UPDATE OF booked_count, capacity ON schedule
+        WHEN OLD.booked_count IS NOT NEW.booked_count OR OLD.capacity IS NOT NEW.capacity
+        BEGIN
+            INSERT INTO seat_changes (schedule_id, booked_count, capacity)
+            VALUES (NEW.id, NEW.booked_count, NEW.capacity);
+        END
+        """,
+        # A deleted session is logged with NULL counts
+        """
+        CREATE TRIGGER IF NOT EXISTS schedule_seats_delete
+        AFTER DELETE ON schedule
+        BEGIN
+            INSERT INTO seat_changes (schedule_id, booked_count, capacity)
+            VALUES (OLD.id, NULL, NULL);
+        END
+        """,
+        # Only the recent tail is needed, so keep the log bounded
+        """
+        CREATE TRIGGER IF NOT EXISTS seat_changes_prune
+        AFTER INSERT ON seat_changes
+        BEGIN
+            DELETE FROM seat_changes WHERE id <= NEW.id - 10000;
+        END
+        """,
+    ]),
+    (7, "Daily utilization summary kept current by triggers", [
+        """
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            date TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            sessions INTEGER NOT NULL,
+            capacity INTEGER NOT NULL,
+            booked INTEGER NOT NULL,
+            PRIMARY KEY (date, dimension, key)
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS schedule_stats_insert
+        AFTER INSERT ON schedule
+        BEGIN
+            {_stats_delta("NEW", "")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS schedule_stats_delete
+        AFTER DELETE ON schedule
+        BEGIN
+            {_stats_delta("OLD", "-")}
+            DELETE FROM daily_stats WHERE date = OLD.date AND sessions = 0;
+        END
+        """,
+        # Bookings only move booked_count: three in-place updates suffice
+        """
+        CREATE TRIGGER IF NOT EXISTS schedule_stats_booked
+        AFTER UPDATE OF booked_count ON schedule
+        WHEN OLD.name IS NEW.name AND OLD.date IS NEW.date AND OLD.time IS NEW.time
+             AND OLD.capacity IS NEW.capacity AND OLD.booked_count IS NOT NEW.booked_count
+        BEGIN
+            UPDATE daily_stats SET booked = booked + NEW.booked_count - OLD.booked_count
+            WHERE date = NEW.date AND dimension = 'day' AND key = '';
+            UPDATE daily_stats SET booked = booked + NEW.booked_count - OLD.booked_count
+            WHERE date = NEW.date AND dimension = 'class' AND key = NEW.name;
+            UPDATE daily_stats SET booked = booked + NEW.booked_count - OLD.booked_count
+            WHERE date = NEW.date AND dimension = 'slot' AND key = NEW.time;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS schedule_stats_update
+        AFTER UPDATE OF name, date, time, capacity ON schedule
+        WHEN OLD.name IS NOT NEW.name OR OLD.date IS NOT NEW.date
+             OR OLD.time IS NOT NEW.time OR OLD.capacity IS NOT NEW.capacity
+        BEGIN
+            {_stats_delta("OLD", "-")}
+            {_stats_delta("NEW", "")}
+            DELETE FROM daily_stats WHERE date = OLD.date AND sessions = 0;
+        END
+        """,
+        *REBUILD_DAILY_STATS,
+    ]),
+    (8, "Per-session waitlist and seat release on cancellation", [
+        # AUTOINCREMENT ids never go backwards, so id order is join order
+        """
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_id INTEGER NOT NULL,
+            customer_name TEXT NOT NULL,
+            customer_email TEXT NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (schedule_id) REFERENCES schedule (id)
+        )
+        """,
+        # The head of a session's queue is the first entry of this index
+        "CREATE INDEX IF NOT EXISTS idx_waitlist_schedule ON waitlist (schedule_id, id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_waitlist_member ON waitlist (schedule_id, customer_email)",
+        """
+        CREATE TRIGGER IF NOT EXISTS bookings_after_delete
+        AFTER DELETE ON bookings
+        BEGIN
+            UPDATE schedule SET booked_count = booked_count - 1
+            WHERE id = OLD.schedule_id AND booked_count > 0;
+        END
+        """,
+    ]),
+    (9, "Session durations and an index over (date, start, end)", [
+        "ALTER TABLE schedule ADD COLUMN duration INTEGER NOT NULL DEFAULT 60",
+        # HH:MM like time, running past 23:59 rather than wrapping, so plain
+        # string comparison orders start and end times correctly
+        f"""
+        ALTER TABLE schedule ADD COLUMN end_time TEXT
+        GENERATED ALWAYS AS ({SLOT_END_SQL}) VIRTUAL
+        """,
+        "DROP INDEX IF EXISTS idx_schedule_date_time",
+        """
+        CREATE INDEX IF NOT EXISTS idx_schedule_date_time
+        ON schedule (date, time, id, name, capacity, booked_count, duration)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_schedule_slot ON schedule (date, time, end_time)",
+        "ALTER TABLE recurrence_rules ADD COLUMN duration INTEGER NOT NULL DEFAULT 60",
+    ]),
+    (10, "Archival flag so moving old sessions out keeps their history", [
+        # active is only ever 1 inside the archiving transaction, so other
+        # connections never see it set. archived_before is the latest cutoff.
+        """
+        CREATE TABLE IF NOT EXISTS archiving (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            active INTEGER NOT NULL DEFAULT 0,
+            archived_before TEXT
+        )
+        """,
+        "INSERT OR IGNORE INTO archiving (id, active) VALUES (1, 0)",
+        # Archived sessions stay in daily_stats and are not announced as deleted
+        "DROP TRIGGER IF EXISTS schedule_stats_delete",
+        f"""
+        CREATE TRIGGER schedule_stats_delete
+        AFTER DELETE ON schedule
+        WHEN NOT EXISTS (SELECT 1 FROM archiving WHERE active)
+        BEGIN
+            {_stats_delta("OLD", "-")}
+            DELETE FROM daily_stats WHERE date = OLD.date AND sessions = 0;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS schedule_seats_delete",
+        """
+        CREATE TRIGGER schedule_seats_delete
+        AFTER DELETE ON schedule
+        WHEN NOT EXISTS (SELECT 1 FROM archiving WHERE active)
+        BEGIN
+            INSERT INTO seat_changes (schedule_id, booked_count, capacity)
+            VALUES (OLD.id, NULL, NULL);
+        END
+        """,
+    ]),
+    (11, "One booking per customer and session, indexed by customer", [
+        _remove_duplicate_bookings,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_customer
+        ON bookings (customer_email, schedule_id)
+        """,
+    ]),
+    (12, "Full-text index over class names", [
+        # External content: the index stores only tokens and reads names
+        # back from schedule, whose id is the FTS rowid
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS schedule_fts USING fts5 (
+            name, content = 'schedule', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        """,
+        "INSERT INTO schedule_fts (schedule_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER IF NOT EXISTS schedule_fts_insert
+        AFTER INSERT ON schedule
+        BEGIN
+            INSERT INTO schedule_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS schedule_fts_update
+        AFTER UPDATE OF name ON schedule
+        BEGIN
+            INSERT INTO schedule_fts (schedule_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+            INSERT INTO schedule_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS schedule_fts_delete
+        AFTER DELETE ON schedule
+        BEGIN
+            INSERT INTO schedule_fts (schedule_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+        END
+        """,
+    ]),
+    (13, "High-water marks for booked_count reconciliation", [
+        # last_run_at stays NULL until the first run, which is always full
+        """
+        CREATE TABLE IF NOT EXISTS reconcile_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_booking_id INTEGER NOT NULL DEFAULT 0,
+            last_change_id INTEGER NOT NULL DEFAULT 0,
+            last_run_at TEXT,
+            last_mode TEXT
+        )
+        """,
+        "INSERT OR IGNORE INTO reconcile_state (id) VALUES (1)",
+    ]),
+    (14, "Remember how far each recurrence rule has been expanded", [
+        # Later expansions start after this date, so deleted sessions stay deleted
+        "ALTER TABLE recurrence_rules ADD COLUMN expanded_through TEXT",
+        """
+        UPDATE recurrence_rules SET expanded_through = (
+            SELECT MAX(date) FROM schedule WHERE rule_id = recurrence_rules.id
+        )
+        """,
+    ]),
+    (15, "Store customer emails trimmed and lower-cased", [
+        # Addresses differing only in case or spaces become one customer;
+        # waitlist copies go first so nobody is promoted twice
+        """
+        DELETE FROM waitlist WHERE id NOT IN (
+            SELECT MIN(id) FROM waitlist GROUP BY schedule_id, lower(trim(customer_email))
+        )
+        """,
+        _remove_duplicate_bookings,
+        """
+        UPDATE bookings SET customer_email = lower(trim(customer_email))
+        WHERE customer_email <> lower(trim(customer_email))
+        """,
+        """
+        UPDATE waitlist SET customer_email = lower(trim(customer_email))
+        WHERE customer_email <> lower(trim(customer_email))
+        """,
+        _normalize_archived_emails,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Sessions that may overlap proposed slots: those on the given days, plus
+# those on the days before that run past midnight. Shared with
+# GymDatabase._find_overlaps, which sorts the (few) rows itself.
+FIND_OVERLAPS_SQL = """
+    SELECT id, name, date, time, end_time FROM schedule
+    WHERE date IN (SELECT value FROM json_each(?))
+       OR (date IN (SELECT value FROM json_each(?)) AND end_time > '24:00')
+"""
+
+# A customer's bookings, upcoming and past (archived included). Shared with
+# GymDatabase.get_customer_bookings so the plan check runs the real SQL.
+CUSTOMER_UPCOMING_SQL = """
+    SELECT b.id, b.schedule_id, s.name, s.date, s.time, s.duration, b.booking_time
+    FROM bookings b JOIN schedule s ON s.id = b.schedule_id
+    WHERE b.customer_email = ? AND s.date >= ?
+    ORDER BY s.date, s.time
+"""
+CUSTOMER_PAST_SQL = """
+    SELECT b.id, b.schedule_id, s.name, s.date, s.time, s.duration, b.booking_time
+    FROM bookings b JOIN schedule s ON s.id = b.schedule_id
+    WHERE b.customer_email = ? AND s.date < ?
+    UNION ALL
+    SELECT b.id, b.schedule_id, s.name, s.date, s.time, s.duration, b.booking_time
+    FROM archive.bookings b JOIN archive.schedule s ON s.id = b.schedule_id
+    WHERE b.customer_email = ?
+    ORDER BY 4 DESC, 5 DESC
+    LIMIT ?
+"""
+
+# Queries issued on every page load, with representative parameters. An
+# optional fourth item True marks a query whose temporary sort is expected
+# because it only sorts one customer's rows.
+HOT_QUERIES = [
+    ("get_upcoming_schedule",
+     "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule "
+     "WHERE date BETWEEN ? AND ? ORDER BY date, time",
+     ("2024-01-01", "2024-01-15")),
+    ("get_today_schedule",
+     "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule "
+     "WHERE date = ? ORDER BY time",
+     ("2024-01-01",)),
+    ("get_all_schedules",
+     "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule "
+     "ORDER BY date, time",
+     ()),
+    ("get_schedules_page",
+     "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule "
+     "WHERE (date, time, id) > (?, ?, ?) AND date <= ? ORDER BY date, time, id LIMIT ?",
+     ("2024-01-01", "07:00", 1, "2024-12-31", 51)),
+    ("search_schedules",
+     "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule "
+     "WHERE date BETWEEN ? AND ? AND time >= ? AND time < ? AND booked_count < capacity "
+     "AND +id IN (SELECT rowid FROM schedule_fts WHERE schedule_fts MATCH ?) "
+     "ORDER BY date, time",
+     ("2024-01-01", "2024-01-15", "06:00", "12:00", '"yoga"*')),
+    ("get_schedule_by_id",
+     "SELECT id, name, date, time, capacity, booked_count, duration FROM schedule WHERE id = ?",
+     (1,)),
+    ("find_overlaps", FIND_OVERLAPS_SQL,
+     ('["2024-01-01", "2024-01-02"]', '["2023-12-31"]')),
+    ("get_bookings_by_schedule",
+     "SELECT b.id, b.customer_name, b.customer_email, b.booking_time FROM bookings b "
+     "WHERE b.schedule_id = ? ORDER BY b.booking_time DESC",
+     (1,)),
+    ("get_bookings_page",
+     "SELECT id, customer_name, customer_email, booking_time FROM bookings "
+     "WHERE schedule_id = ? AND (booking_time, id) < (?, ?) "
+     "ORDER BY booking_time DESC, id DESC LIMIT ?",
+     (1, "2024-01-01 00:00:00", 100, 51)),
+    ("get_customer_bookings (upcoming)", CUSTOMER_UPCOMING_SQL,
+     ("someone@example.com", "2024-01-01"), True),
+    ("get_customer_bookings (past)", CUSTOMER_PAST_SQL,
+     ("someone@example.com", "2024-01-01", "someone@example.com", 50), True),
+    ("delete_schedule (bookings)",
+     "DELETE FROM bookings WHERE schedule_id = ?",
+     (1,)),
+    ("cancel_booking (waitlist head)",
+     "SELECT id, customer_name, customer_email FROM waitlist "
+     "WHERE schedule_id = ? ORDER BY id LIMIT 1",
+     (1,)),
+    ("get_waitlist_position",
+     "SELECT COUNT(*) FROM waitlist WHERE schedule_id = ? AND id <= ("
+     "SELECT id FROM waitlist WHERE schedule_id = ? AND customer_email = ?)",
+     (1, 1, "someone@example.com")),
+]
+
+
+def get_version(conn):
+    """Return the schema version stored in the database file."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration. Returns the list of versions applied."""
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if get_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Run EXPLAIN QUERY PLAN on each hot query.
+
+    Returns (name, plan lines, ok) tuples, where ok means every table access
+    goes through an index or the primary key and no temporary sort is needed
+    (unless the query is marked as expecting one).
+    """
+    results = []
+    for name, sql, params, *expect_sort in queries:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        ok = all(
+            ("USING" in line or "VIRTUAL TABLE" in line or not line.startswith(("SCAN", "SEARCH")))
+            and (expect_sort or "TEMP B-TREE" not in line)
+            for line in plan
+        )
+        results.append((name, plan, ok))
+    return results
+
+
+if __name__ == "__main__":
+    from gym_database import GymDatabase
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "gym_schedule.db"
+    conn = sqlite3.connect(db_path)
+    before = get_version(conn)
+    conn.close()
+
+    # Opening the database runs create_tables and then the migrations
+    db = GymDatabase(db_path)
+    with db.pool.connection() as conn:
+        version = get_version(conn)
+        print(f"{db_path}: schema version {before} -> {version}")
+        if version > LATEST_VERSION:
+            print(f"warning: this code only knows schema version {LATEST_VERSION}; "
+                  "the database was migrated by a newer release")
+        failures = 0
+        for name, plan, ok in check_query_plans(conn):
+            print(f"[{'ok' if ok else 'NO INDEX'}] {name}")
+            for line in plan:
+                print(f"    {line}")
+            failures += not ok
+    db.close()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,81 @@
+"""Read-through cache for GymDatabase queries.
+
+Entries are tagged with the database's data version (see the data_version
+table) at the time they were read. Any write to the schedule, from this
+process or another one, bumps the version, which makes every older entry a
+miss. Entries also expire after a TTL and the least recently used ones are
+evicted once the cache is full.
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """A thread-safe LRU cache with a TTL and a version tag per entry."""
+
+    def __init__(self, maxsize=256, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Return (hit, value) for key if it was stored at this version."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires, value = entry
+                if entry_version == version and expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, version, value):
+        """Store value for key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def cached_read(method):
+    """Serve a GymDatabase read method from self.cache when it is enabled.
+
+    The data version is read before the query, so a result can only ever be
+    newer than the version it is stored under, never older. Arguments are
+    bound to the signature with defaults applied, so positional and keyword
+    calls share one entry.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        version = self.get_data_version()
+        key = (method.__name__,) + tuple(bound.arguments.values())[1:]
+        hit, value = self.cache.get(key, version)
+        if hit:
+            return value
+        value = method(self, *args, **kwargs)
+        self.cache.set(key, version, value)
+        return value
+    return wrapper
@@ -0,0 +1,40 @@
+"""Template rendering helpers shared by the Flask apps.
+
+Compiled templates are kept in a Jinja bytecode cache on disk, so a freshly
+started worker loads them instead of compiling every template again. Large
+pages can also be assembled from fragments held in a QueryCache: each
+fragment is stored under a key (such as a date) and tagged with the data it
+was rendered from, and is only rendered again once that data changes.
+"""
+import os
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+
+def enable_bytecode_cache(app, directory=None):
+    """Store compiled templates for app on disk.
+
+    directory defaults to GYM_TEMPLATE_CACHE, then to Jinja's per-user
+    temporary directory. Entries are keyed by template name and checked
+    against the source checksum, so edited templates are recompiled.
+    """
+    directory = directory or os.environ.get("GYM_TEMPLATE_CACHE")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def render_fragment(cache, key, data, template, **context):
+    """Render template, or reuse the fragment cached under key for the same data.
+
+    data must be hashable and equal to the data of an earlier render exactly
+    when the output would be the same; a tuple of row namedtuples works.
+    """
+    hit, html = cache.get(key, data)
+    if hit:
+        return html
+    html = Markup(render_template(template, **context))
+    cache.set(key, data, html)
+    return html
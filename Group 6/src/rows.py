@@ -0,0 +1,104 @@
+"""Typed rows returned by GymDatabase.
+
+Each row type is a namedtuple with ``__slots__ = ()``: attribute access by
+name, no per-instance ``__dict__``, and the same memory footprint as the
+plain tuples sqlite3 returns. Rows still unpack and index like tuples, so
+JSON, CSV and cache code that treats them as sequences keeps working.
+
+GymDatabase builds them straight from the cursor through ``query``, which
+installs the row type's factory as the cursor's ``row_factory``.
+"""
+from collections import namedtuple
+
+
+def slot_end(time, duration):
+    """Return the HH:MM end of a session; matches the end_time column."""
+    minutes = int(time[:2]) * 60 + int(time[3:5]) + int(duration)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _percent(part, whole):
+    return part / whole * 100 if whole and whole > 0 else 0
+
+
+class Schedule(namedtuple("Schedule", "id name date time capacity booked_count duration")):
+    __slots__ = ()
+
+    @property
+    def seats_left(self):
+        return max(self.capacity - self.booked_count, 0)
+
+    @property
+    def is_full(self):
+        return self.booked_count >= self.capacity
+
+    @property
+    def fill_pct(self):
+        return _percent(self.booked_count, self.capacity)
+
+    @property
+    def end_time(self):
+        return slot_end(self.time, self.duration)
+
+
+class Booking(namedtuple("Booking", "id customer_name customer_email booking_time")):
+    __slots__ = ()
+
+
+class BookingDetail(namedtuple("BookingDetail", "booking_id schedule_id session_name session_date "
+                                                "session_time customer_name customer_email booking_time")):
+    """A booking joined with its session, as exported."""
+    __slots__ = ()
+
+
+class CustomerBooking(namedtuple("CustomerBooking",
+                                 "booking_id schedule_id name date time duration booking_time")):
+    """One of a customer's bookings with the session it is for."""
+    __slots__ = ()
+
+    @property
+    def end_time(self):
+        return slot_end(self.time, self.duration)
+
+
+class WaitlistEntry(namedtuple("WaitlistEntry", "id customer_name customer_email joined_at")):
+    __slots__ = ()
+
+
+class RecurrenceRule(namedtuple("RecurrenceRule",
+                                "id name weekdays time capacity start_date end_date duration")):
+    __slots__ = ()
+
+    @property
+    def days(self):
+        """Weekday numbers (Monday = 0) the rule runs on."""
+        return [int(day) for day in self.weekdays.split(",") if day]
+
+
+class Utilization(namedtuple("Utilization", "key sessions capacity booked")):
+    __slots__ = ()
+
+    @property
+    def fill_pct(self):
+        return _percent(self.booked, self.capacity)
+
+
+class CountDrift(namedtuple("CountDrift", "schedule_id name date time capacity recorded actual")):
+    """A session whose booked_count (recorded) differs from its booking rows."""
+    __slots__ = ()
+
+    @property
+    def overbooked(self):
+        return self.actual > self.capacity
+
+
+class SeatChange(namedtuple("SeatChange", "id schedule_id booked_count capacity")):
+    __slots__ = ()
+
+
+def query(conn, row_type, sql, params=()):
+    """Execute sql on conn and return a cursor that yields row_type objects."""
+    make = row_type._make
+    cursor = conn.cursor()
+    cursor.row_factory = lambda cursor, row: make(row)
+    return cursor.execute(sql, params)
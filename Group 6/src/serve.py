@@ -0,0 +1,142 @@
+"""Run the admin or customer app under gunicorn with several worker processes.
+
+Usage: python serve.py {admin,customer} [--db gym_schedule.db] [--bind HOST:PORT]
+                       [--workers N] [--worker-class {gevent,gthread}]
+                       [--threads 8] [--sse-clients 64] [--sample-data]
+
+The app module is imported once in the master process (preload), which
+creates the schema and applies pending migrations before any worker
+exists. The master then closes its database connections and forks the
+workers; each worker opens its own connections on first use, and the
+booking writer and seat feed threads start lazily inside the workers.
+
+Every customer /schedule page keeps an /api/seats/stream connection open
+for as long as it is shown. The customer app therefore runs on gevent
+workers when gevent is installed, where an open stream costs a greenlet
+rather than a thread. Under gunicorn's threaded worker (the admin app,
+or the customer app without gevent) each open stream holds one request
+thread until the browser leaves, so the customer app gets --sse-clients
+threads on top of --threads, spread over the workers; once they are all
+taken, every other request waits. /metrics reports the worker that
+answered the request.
+
+Reloading (PID is the master's, printed at startup):
+    kill -HUP PID    replace every worker gracefully, finishing their
+                     in-flight requests; code stays as loaded
+    kill -USR2 PID   start a new master with freshly imported code next to
+                     the old one, then kill -QUIT the old master
+    kill -TERM PID   graceful shutdown
+"""
+import argparse
+import os
+import sys
+
+# Default ports match app.run in each module; the flag marks apps serving SSE
+APPS = {
+    "admin": ("admin_app", 5001, False),
+    "customer": ("customer_app", 5004, True),
+}
+
+
+def default_worker_class(serves_sse):
+    if serves_sse:
+        try:
+            import gevent  # noqa: F401
+            return "gevent"
+        except ImportError:
+            pass
+    return "gthread"
+
+
+def close_database(server, worker):
+    """pre_fork hook: the master keeps no connections for children to inherit."""
+    server.app.module.db.close()
+
+
+def build_application(module_name, options):
+    from gunicorn.app.base import BaseApplication
+
+    class GymApplication(BaseApplication):
+        def __init__(self):
+            self.module = None
+            super().__init__()
+
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            if self.module is None:
+                import importlib
+                self.module = importlib.import_module(module_name)
+            return self.module.app
+
+    return GymApplication()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("app", choices=sorted(APPS))
+    parser.add_argument("--db", default=os.environ.get("GYM_DB", "gym_schedule.db"))
+    parser.add_argument("--bind", help="HOST:PORT (default 0.0.0.0 on the app's usual port)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--worker-class", choices=["gevent", "gthread"],
+                        help="default: gevent for the customer app if installed, else gthread")
+    parser.add_argument("--threads", type=int, default=8,
+                        help="request threads per gthread worker, not counting SSE streams")
+    parser.add_argument("--sse-clients", type=int, default=64,
+                        help="open /schedule pages to leave gthread threads for, across all workers")
+    parser.add_argument("--worker-connections", type=int, default=1000,
+                        help="concurrent connections per gevent worker")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="seconds a worker gets to finish requests on reload or shutdown")
+    parser.add_argument("--sample-data", action="store_true",
+                        help="fill a new, empty database with the sample schedule")
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        sys.exit("serve.py needs gunicorn: pip install gunicorn")
+
+    module_name, port, serves_sse = APPS[args.app]
+    worker_class = args.worker_class or default_worker_class(serves_sse)
+    if worker_class == "gevent":
+        try:
+            from gevent import monkey
+        except ImportError:
+            sys.exit("--worker-class gevent needs gevent: pip install gevent")
+        # Before the app is imported, so its locks and queues are cooperative
+        monkey.patch_all()
+        concurrency = {"worker_connections": args.worker_connections}
+    else:
+        threads = args.threads
+        if serves_sse:
+            threads += -(-args.sse_clients // args.workers)
+            print(f"gthread workers: {threads} threads each, sized for {args.sse_clients} open "
+                  "seat streams; install gevent to serve streams without threads")
+        concurrency = {"threads": threads}
+    # The apps read GYM_DB when they are imported
+    os.environ["GYM_DB"] = args.db
+    is_new = not os.path.exists(args.db)
+
+    application = build_application(module_name, {
+        "bind": args.bind or f"0.0.0.0:{port}",
+        "workers": args.workers,
+        "worker_class": worker_class,
+        **concurrency,
+        "graceful_timeout": args.graceful_timeout,
+        "preload_app": True,
+        "pre_fork": close_database,
+        "proc_name": f"gym-{args.app}",
+    })
+    # Import now, in the master: runs create_tables and the migrations once
+    application.load()
+    if is_new and args.sample_data:
+        application.module.db.initialize_sample_data()
+        print("Database initialized with sample data.")
+    application.run()
+
+
+if __name__ == "__main__":
+    main()